@@ -0,0 +1,8 @@
+"""URL-конфигурация для ASGI: асинхронные версии нагруженных эндпоинтов
+подключаются перед синхронными с теми же путями."""
+from django.urls import include, path
+
+urlpatterns = [
+    path('api/', include('recipes.async_urls')),
+    path('', include('foodgram.urls')),
+]
@@ -0,0 +1,74 @@
+import asyncio
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.deprecation import MiddlewareMixin
+
+PRIMARY = 'default'
+PIN_KEY = 'db_router:pinned:{user_id}'
+
+_replica = ContextVar('db_router_replica', default=None)
+_pinned = ContextVar('db_router_pinned', default=False)
+
+
+def use_replica(request):
+    """Направляет чтения текущего запроса на одну из реплик.
+
+    Пользователь, недавно выполнявший запись, читает с основной базы,
+    чтобы увидеть свои изменения несмотря на задержку репликации.
+    """
+    if not settings.DATABASE_REPLICAS or _pinned.get():
+        return
+    user = request.user
+    if user.is_authenticated and cache.get(PIN_KEY.format(user_id=user.id)):
+        return
+    _replica.set(random.choice(settings.DATABASE_REPLICAS))
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _pinned.get():
+            return PRIMARY
+        return _replica.get() or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        _pinned.set(True)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        replica_token = _replica.set(None)
+        pinned_token = _pinned.set(False)
+        try:
+            response = self.get_response(request)
+            self.pin_writer(request)
+            return response
+        finally:
+            _replica.reset(replica_token)
+            _pinned.reset(pinned_token)
+
+    async def __acall__(self, request):
+        replica_token = _replica.set(None)
+        pinned_token = _pinned.set(False)
+        try:
+            response = await self.get_response(request)
+            self.pin_writer(request)
+            return response
+        finally:
+            _replica.reset(replica_token)
+            _pinned.reset(pinned_token)
+
+    def pin_writer(self, request):
+        user = getattr(request, 'user', None)
+        if (_pinned.get() and settings.DATABASE_REPLICAS
+                and user is not None and user.is_authenticated):
+            cache.set(PIN_KEY.format(user_id=user.id), True,
+                      settings.DB_REPLICA_PIN_SECONDS)
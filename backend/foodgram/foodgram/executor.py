@@ -0,0 +1,9 @@
+"""Пул потоков для синхронной работы асинхронных представлений и
+middleware под ASGI (``ASYNC_DB_THREADS``): запросы к базе и сжатие ответов
+идут в нём, а не в одном общем потоке синхронного кода Django."""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+executor = ThreadPoolExecutor(max_workers=settings.ASYNC_DB_THREADS,
+                              thread_name_prefix='async-db')
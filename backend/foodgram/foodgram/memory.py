@@ -0,0 +1,197 @@
+"""Профилирование памяти воркера (MEMORY_PROFILING=true).
+
+При загрузке MemoryProfilingMiddleware запускается tracemalloc. Для каждого
+представления копятся число запросов, средний прирост памяти к выходу
+ответа из middleware (вместе с самим ответом, поэтому большие ответы
+видны здесь) и наибольший пик во время запроса. Каждый
+MEMORY_SAMPLE_EVERY-й запрос снимается до и после, и места выделения
+(файл:строка) с наибольшим приростом складываются в статистику его
+представления. Раз в MEMORY_SNAPSHOT_INTERVAL секунд снимается весь
+процесс: разница с первым снимком показывает места, которые растут с
+начала работы воркера (кандидаты в утечки), с предыдущим - рост за
+последний интервал.
+
+Данные свои у каждого процесса; MemoryView отдаёт их администратору для
+воркера, который обработал запрос (pid в ответе). Параллельные запросы
+потоков одного воркера попадают в приросты друг друга, поэтому цифры по
+представлениям - оценка, надёжная на повторяющихся запросах. Трассировка
+замедляет запросы в несколько раз и включается на время поиска утечки.
+"""
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from django.conf import settings
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+FRAMES = 1
+TOP_SITES = 10
+UNRESOLVED = '-'
+# Собственные снимки профилировщика и служебные кадры.
+IGNORED_FILES = {__file__, tracemalloc.__file__, '<unknown>',
+                 '<frozen importlib._bootstrap>',
+                 '<frozen importlib._bootstrap_external>'}
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def get_rss():
+    """Текущий RSS процесса в байтах; без /proc - наибольший за время
+    работы."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def take_sites():
+    """Размер и число блоков по местам выделения: {файл:строка: (байт,
+    блоков)}."""
+    # Отбор по строкам статистики, а не filter_traces: тот сверяет с
+    # шаблонами каждый блок и на десятках тысяч блоков занимает секунды.
+    return {
+        str(frame): (stat.size, stat.count)
+        for stat in tracemalloc.take_snapshot().statistics('lineno')
+        for frame in stat.traceback[:1]
+        if frame.filename not in IGNORED_FILES
+    }
+
+
+def diff_sites(new, old, top=TOP_SITES):
+    """Места с наибольшим приростом памяти от old к new."""
+    growth = []
+    for site, (size, count) in new.items():
+        old_size, old_count = old.get(site, (0, 0))
+        if size > old_size:
+            growth.append((site, size - old_size, count - old_count))
+    growth.sort(key=lambda item: -item[1])
+    return [
+        {'site': site, 'size_diff': size, 'count_diff': count}
+        for site, size, count in growth[:top]
+    ]
+
+
+class ViewStats:
+    __slots__ = ('requests', 'held', 'peak', 'sites')
+
+    def __init__(self):
+        self.requests = 0
+        self.held = 0
+        self.peak = 0
+        self.sites = Counter()
+
+    def as_dict(self, view):
+        return {
+            'view': view,
+            'requests': self.requests,
+            'held_avg': self.held // self.requests,
+            'peak': self.peak,
+            'sites': [{'site': site, 'size_diff': size}
+                      for site, size in self.sites.most_common(TOP_SITES)],
+        }
+
+
+class Profiler:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.requests = 0
+        self.first = self.previous = self.last = None
+        self.last_at = 0
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(FRAMES)
+
+    def should_sample(self):
+        with self.lock:
+            self.requests += 1
+            return not self.requests % settings.MEMORY_SAMPLE_EVERY
+
+    def snapshot(self, force=False):
+        now = time.monotonic()
+        interval = settings.MEMORY_SNAPSHOT_INTERVAL
+        with self.lock:
+            if (not force and self.last is not None
+                    and now - self.last_at < interval):
+                return
+            self.last_at = now
+        sites = take_sites()
+        with self.lock:
+            self.previous = self.last or sites
+            self.last = sites
+            if self.first is None:
+                self.first = sites
+
+    def record(self, view, held, peak, sites=None):
+        with self.lock:
+            stats = self.views.get(view)
+            if stats is None:
+                stats = self.views[view] = ViewStats()
+            stats.requests += 1
+            stats.held += held
+            stats.peak = max(stats.peak, peak)
+            for site in sites or ():
+                stats.sites[site['site']] += site['size_diff']
+
+    def report(self):
+        current, peak = tracemalloc.get_traced_memory()
+        with self.lock:
+            views = sorted(self.views.items(),
+                           key=lambda item: -item[1].peak)
+            return {
+                'pid': os.getpid(),
+                'rss': get_rss(),
+                'traced': current,
+                'traced_peak': peak,
+                'requests': self.requests,
+                'views': [stats.as_dict(view) for view, stats in views],
+                'growth': diff_sites(self.last or {}, self.first or {}),
+                'recent': diff_sites(self.last or {}, self.previous or {}),
+            }
+
+
+profiler = Profiler()
+
+
+class MemoryProfilingMiddleware:
+    """Подключается в settings только при MEMORY_PROFILING; синхронный,
+    под ASGI Django вызывает его в потоке."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        profiler.start()
+
+    def __call__(self, request):
+        profiler.snapshot()
+        before = take_sites() if profiler.should_sample() else None
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        response = self.get_response(request)
+        end, peak = tracemalloc.get_traced_memory()
+        match = request.resolver_match
+        # Не путь запроса: адреса без представления размножили бы ключи.
+        view = match.view_name if match is not None else UNRESOLVED
+        sites = diff_sites(take_sites(), before) if before else None
+        profiler.record(view, end - start, peak - start, sites)
+        return response
+
+
+class MemoryView(APIView):
+    """Статистика памяти воркера, обработавшего запрос; ?snapshot=1
+    снимает процесс перед ответом."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        if not tracemalloc.is_tracing():
+            return Response({'pid': os.getpid(), 'rss': get_rss(),
+                             'tracing': False})
+        if request.query_params.get('snapshot'):
+            profiler.snapshot(force=True)
+        return Response({'tracing': True, **profiler.report()})
@@ -0,0 +1,103 @@
+import asyncio
+import re
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+from .executor import executor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+re_accepts_brotli = re.compile(r'\bbr\b')
+re_accepts_gzip = re.compile(r'\bgzip\b')
+
+
+def check_connections():
+    """Закрывает постоянные соединения текущего потока, которые перестали
+    отвечать, чтобы следующий запрос к базе открыл новое.
+
+    Аналог ``CONN_HEALTH_CHECKS`` из Django 4.1, но проверяются только
+    соединения, не использованные дольше DB_CONN_HEALTH_CHECK_IDLE секунд:
+    проверка - лишний запрос к базе. Соединение, оборвавшееся во время
+    нагрузки, закроется после ошибки в конце запроса, как без проверок.
+    """
+    now = time.monotonic()
+    for connection in connections.all():
+        if (connection.connection is None
+                or not connection.settings_dict.get('CONN_HEALTH_CHECKS')):
+            continue
+        used_at = getattr(connection, 'used_at', None)
+        connection.used_at = now
+        if (used_at is not None
+                and now - used_at < settings.DB_CONN_HEALTH_CHECK_IDLE):
+            continue
+        if not connection.is_usable():
+            connection.close()
+
+
+class ConnectionHealthCheckMiddleware(MiddlewareMixin):
+    def __call__(self, request):
+        # Асинхронные представления работают с базой в потоках пула и
+        # проверяют соединения там же.
+        if not asyncio.iscoroutinefunction(self.get_response):
+            check_connections()
+        return self.get_response(request)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Сжимает JSON-ответы больше COMPRESSION_MIN_SIZE байт brotli, если
+    клиент его принимает и установлен пакет brotli, иначе gzip.
+
+    Под ASGI сжатие выполняется в пуле потоков ASYNC_DB_THREADS: обработчик
+    MiddlewareMixin занял бы им общий поток синхронного кода.
+    """
+
+    def should_compress(self, response):
+        return not (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith(
+                'application/json')
+            or len(response.content) < settings.COMPRESSION_MIN_SIZE
+        )
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if not self.should_compress(response):
+            return response
+        return await sync_to_async(
+            self.process_response, thread_sensitive=False,
+            executor=executor)(request, response)
+
+    def process_response(self, request, response):
+        if not self.should_compress(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and re_accepts_brotli.search(accept_encoding):
+            encoding = 'br'
+            content = brotli.compress(
+                response.content, mode=brotli.MODE_TEXT,
+                quality=settings.COMPRESSION_BROTLI_QUALITY)
+        elif re_accepts_gzip.search(accept_encoding):
+            encoding = 'gzip'
+            content = compress_string(response.content)
+        else:
+            return response
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
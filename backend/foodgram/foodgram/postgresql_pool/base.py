@@ -0,0 +1,95 @@
+"""Бэкенд PostgreSQL с пулом соединений внутри процесса.
+
+Соединения берутся из ``psycopg2.pool.ThreadedConnectionPool`` и
+возвращаются в него при закрытии, поэтому бэкенд используется вместе с
+``CONN_MAX_AGE = 0``. Ключ ``POOL`` настроек базы: ``MAX_SIZE`` - размер
+пула, ``MIN_SIZE`` - сколько соединений открыть сразу (1), ``TIMEOUT`` -
+сколько секунд ждать свободного соединения, когда все заняты (10), после
+чего поднимается OperationalError.
+
+Пулы создаются отдельно в каждом процессе: gunicorn с preload_app
+загружает приложение в мастере, и соединения, открытые там до fork,
+иначе достались бы всем воркерам.
+"""
+import os
+import threading
+
+import psycopg2.extras
+from django.db import OperationalError
+from django.db.backends.postgresql import base
+from psycopg2 import pool
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_MIN_SIZE = 1
+DEFAULT_TIMEOUT = 10
+
+_pools = {}
+_pools_pid = os.getpid()
+_pools_lock = threading.Lock()
+# Пулы, унаследованные от родителя. Ссылки держатся, чтобы сборщик мусора
+# не закрыл их соединения: закрытие из воркера оборвало бы соединения
+# родителя, с которыми они делят сокеты.
+_inherited = []
+
+
+class Pool:
+    """ThreadedConnectionPool, который при занятых соединениях ждёт
+    освобождения, а не сразу поднимает PoolError."""
+
+    def __init__(self, options, conn_params):
+        size = options.get('MAX_SIZE', DEFAULT_POOL_SIZE)
+        self.timeout = options.get('TIMEOUT', DEFAULT_TIMEOUT)
+        self.slots = threading.BoundedSemaphore(size)
+        self.connections = pool.ThreadedConnectionPool(
+            min(options.get('MIN_SIZE', DEFAULT_MIN_SIZE), size), size,
+            **conn_params)
+
+    def getconn(self):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise OperationalError(
+                f'Нет свободного соединения в пуле за {self.timeout} с.')
+        try:
+            return self.connections.getconn()
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def putconn(self, connection, close):
+        try:
+            self.connections.putconn(connection, close=close)
+        finally:
+            self.slots.release()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_pool(self, conn_params):
+        global _pools_pid
+        with _pools_lock:
+            if _pools_pid != os.getpid():
+                _inherited.extend(_pools.values())
+                _pools.clear()
+                _pools_pid = os.getpid()
+            if self.alias not in _pools:
+                _pools[self.alias] = Pool(
+                    self.settings_dict.get('POOL', {}), conn_params)
+            return _pools[self.alias]
+
+    def get_new_connection(self, conn_params):
+        self.pool = self.get_pool(conn_params)
+        connection = self.pool.getconn()
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get('isolation_level',
+                                           connection.isolation_level)
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(conn_or_curs=connection,
+                                               loads=lambda x: x)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # Пул, из которого взято соединение: после fork в
+                # _pools уже пул нового процесса.
+                self.pool.putconn(self.connection,
+                                  close=bool(self.connection.closed))
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 import os
+from itertools import zip_longest
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -53,11 +54,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.ConnectionHealthCheckMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'foodgram.db_router.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -82,6 +86,12 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+# URLconf with async versions of the hottest endpoints, used under ASGI.
+ASGI_URLCONF = 'foodgram.asgi_urls'
+
+# Size of the thread pool that runs ORM calls of async views.
+ASYNC_DB_THREADS = int(os.getenv('ASYNC_DB_THREADS', default=8))
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
@@ -93,9 +103,88 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', default=None),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default=None),
         'HOST': os.getenv('DB_HOST', default=None),
-        'PORT': os.getenv('DB_PORT', default=None)
+        'PORT': os.getenv('DB_PORT', default=None),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', default='true').lower() == 'true',
     }
 }
+
+# Persistent connections idle longer than this (seconds) are checked
+# before a request; busier ones are trusted to save a round trip.
+DB_CONN_HEALTH_CHECK_IDLE = int(
+    os.getenv('DB_CONN_HEALTH_CHECK_IDLE', default=10))
+
+# Optional in-process connection pool instead of persistent connections.
+# A request waits up to DB_POOL_TIMEOUT seconds for a free connection.
+if (os.getenv('DB_POOL_SIZE')
+        and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql'):
+    DATABASES['default'].update(
+        ENGINE='foodgram.postgresql_pool',
+        CONN_MAX_AGE=0,
+        POOL={
+            'MAX_SIZE': int(os.getenv('DB_POOL_SIZE')),
+            'TIMEOUT': int(os.getenv('DB_POOL_TIMEOUT', default=10)),
+        },
+    )
+
+# Read replicas: comma separated DB_REPLICA_HOSTS (and/or DB_REPLICA_NAMES
+# for SQLite), other connection parameters are taken from 'default'.
+DATABASE_REPLICAS = []
+for number, (host, name) in enumerate(zip_longest(
+    filter(None, os.getenv('DB_REPLICA_HOSTS', default='').split(',')),
+    filter(None, os.getenv('DB_REPLICA_NAMES', default='').split(',')),
+)):
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': host or DATABASES['default']['HOST'],
+        'NAME': name or DATABASES['default']['NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['foodgram.db_router.ReplicaRouter']
+
+# Seconds a user keeps reading from the primary after a write.
+DB_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', default=5))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
+# Seconds to keep per-user favorite/cart/follow id sets in the cache.
+# Requires a cache shared by all workers; 0 loads them once per request.
+MEMBERSHIP_CACHE_TIMEOUT = int(
+    os.getenv('MEMBERSHIP_CACHE_TIMEOUT', default=0))
+
+# Seconds to keep public user profiles and the user count in the cache.
+# Requires a cache shared by all workers; 0 reads them from the database.
+PROFILE_CACHE_TIMEOUT = int(os.getenv('PROFILE_CACHE_TIMEOUT', default=0))
+
+# Anonymous recipe list/detail responses: seconds fresh in the Django cache
+# (0 disables it; requires a cache shared by all workers), extra seconds
+# served stale while one request re-renders, and the public max-age for
+# the nginx microcache.
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', default=0))
+PAGE_CACHE_STALE_TIMEOUT = int(
+    os.getenv('PAGE_CACHE_STALE_TIMEOUT', default=60))
+PAGE_CACHE_MAX_AGE = int(os.getenv('PAGE_CACHE_MAX_AGE', default=5))
+
+# Warm per-process state (PDF font metrics, URL resolver) when the app is
+# loaded; with gunicorn preload_app the workers inherit it after fork.
+# Each worker also opens its database connections in post_fork.
+WARM_ON_STARTUP = (
+    os.getenv('WARM_ON_STARTUP', default='false').lower() == 'true')
+# Public origin that `manage.py warm_caches` sends its requests as: cached
+# anonymous pages are keyed by scheme and host and contain absolute links.
+# No default: the command refuses to run without it.
+WARM_URL = os.getenv('WARM_URL', default='')
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -137,14 +226,99 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.TokenAuthentication',
     ),
+    'DEFAULT_THROTTLE_CLASSES': [
+        'foodgram.throttling.AnonReadThrottle',
+        'foodgram.throttling.WriteThrottle',
+    ],
+    # Token bucket rates: N requests in a burst, refilled at N per period.
+    # An empty value disables the scope.
+    'DEFAULT_THROTTLE_RATES': {
+        scope: os.getenv(f'THROTTLE_RATE_{scope.upper()}', default=rate) or None
+        for scope, rate in (
+            ('anon', '120/min'),
+            ('writes', '60/min'),
+            ('export', '6/min'),
+            ('login', '10/min'),
+        )
+    },
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', default=1)),
 }
 
+# Cache alias that keeps throttle buckets. Empty means per-process buckets,
+# which are also used whenever the cache is unavailable.
+THROTTLE_CACHE = os.getenv(
+    'THROTTLE_CACHE',
+    default='default' if os.getenv('CACHE_BACKEND') else '')
+
+if os.getenv('ORJSON_ENABLED', default='true').lower() == 'true':
+    REST_FRAMEWORK.update(
+        DEFAULT_RENDERER_CLASSES=[
+            'foodgram.renderers.ORJSONRenderer',
+            'rest_framework.renderers.BrowsableAPIRenderer',
+        ],
+        DEFAULT_PARSER_CLASSES=[
+            'foodgram.renderers.ORJSONParser',
+            'rest_framework.parsers.FormParser',
+            'rest_framework.parsers.MultiPartParser',
+        ],
+    )
+
+# Serialize hot read endpoints with recipes.fast_serializers instead of
+# DRF field machinery. Verify with `manage.py verify_fast_serializers`.
+FAST_SERIALIZERS = (
+    os.getenv('FAST_SERIALIZERS', default='false').lower() == 'true')
+
+# JSON responses smaller than this many bytes are sent uncompressed.
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', default=1024))
+COMPRESSION_BROTLI_QUALITY = int(
+    os.getenv('COMPRESSION_BROTLI_QUALITY', default=5))
+
+# Per-worker tracemalloc profiling for leak hunting (see foodgram/memory.py,
+# report at /api/memory/). Slows requests down; enable temporarily.
+# Every MEMORY_SAMPLE_EVERY-th request records allocation sites for its
+# view; the whole process is snapshotted every MEMORY_SNAPSHOT_INTERVAL
+# seconds.
+MEMORY_PROFILING = (
+    os.getenv('MEMORY_PROFILING', default='false').lower() == 'true')
+MEMORY_SAMPLE_EVERY = int(os.getenv('MEMORY_SAMPLE_EVERY', default=100))
+MEMORY_SNAPSHOT_INTERVAL = int(
+    os.getenv('MEMORY_SNAPSHOT_INTERVAL', default=300))
+if MEMORY_PROFILING:
+    MIDDLEWARE.insert(0, 'foodgram.memory.MemoryProfilingMiddleware')
+
+# SQL queries slower than SLOW_QUERY_MS milliseconds are saved with their
+# call site and a plan sample (EXPLAIN ANALYZE on PostgreSQL) to
+# recipes.SlowQuery, keeping the last SLOW_QUERY_LIMIT rows; see the admin.
+# 0 disables the capture. EXPLAIN ANALYZE runs the query again, so the first
+# slow query of each kind takes about twice as long.
+SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', default=0))
+SLOW_QUERY_LIMIT = int(os.getenv('SLOW_QUERY_LIMIT', default=500))
+# Records are written over a separate connection to the primary database,
+# so they survive a rollback of the request transaction.
+SLOW_QUERY_DATABASE = 'slow_queries'
+if SLOW_QUERY_MS:
+    DATABASES[SLOW_QUERY_DATABASE] = {
+        **DATABASES['default'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+
+# Trending recipes (manage.py refresh_trending): favorites and shopping cart
+# additions over the window, each weight halving every half-life.
+TRENDING_WINDOW_DAYS = int(os.getenv('TRENDING_WINDOW_DAYS', default=14))
+TRENDING_HALF_LIFE_HOURS = float(
+    os.getenv('TRENDING_HALF_LIFE_HOURS', default=72))
+TRENDING_BUCKET_HOURS = 6
+TRENDING_CART_WEIGHT = float(os.getenv('TRENDING_CART_WEIGHT', default=0.5))
+TRENDING_SIZE = int(os.getenv('TRENDING_SIZE', default=500))
+TRENDING_CACHE_TIMEOUT = 600
+
 
 DJOSER = {
     'SERIALIZERS': {
         'token_create': 'users.serializers.TokenCreateSerializer',
-        'current_user': 'users.serializers.UserSerializer',
-        'user': 'users.serializers.UserSerializer',
+        'current_user': 'users.serializers.UserProfileSerializer',
+        'user': 'users.serializers.UserProfileSerializer',
     },
     'PERMISSIONS': {
         'user': ['recipes.permissions.OwnerOrReadOnly'],
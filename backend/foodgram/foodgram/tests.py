@@ -0,0 +1,145 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Recipe
+
+from .db_router import (PRIMARY, ReplicaRouter, ReplicaRoutingMiddleware,
+                        use_replica)
+
+User = get_user_model()
+
+REPLICA = 'replica_test'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRouterTests(SimpleTestCase):
+    """Выбор базы роутером на протяжении запроса."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.router = ReplicaRouter()
+        self.user = User(id=1, username='reader')
+
+    def run_request(self, view, method='get'):
+        """Выполняет view внутри ReplicaRoutingMiddleware."""
+        request = getattr(RequestFactory(), method)('/api/recipes/')
+        request.user = self.user
+
+        def get_response(request):
+            view(request)
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(get_response)(request)
+
+    def test_safe_request_reads_replica(self):
+        routes = []
+
+        def view(request):
+            routes.append(self.router.db_for_read(Recipe))
+            use_replica(request)
+            routes.append(self.router.db_for_read(Recipe))
+
+        self.run_request(view)
+        self.assertEqual(routes, [PRIMARY, REPLICA])
+        # Выбор реплики не переживает запрос.
+        self.assertEqual(self.router.db_for_read(Recipe), PRIMARY)
+
+    def test_reads_after_write_use_primary(self):
+        routes = []
+
+        def view(request):
+            use_replica(request)
+            routes.append(self.router.db_for_write(Recipe))
+            routes.append(self.router.db_for_read(Recipe))
+            use_replica(request)
+            routes.append(self.router.db_for_read(Recipe))
+
+        self.run_request(view, 'post')
+        self.assertEqual(routes, [PRIMARY, PRIMARY, PRIMARY])
+
+    def test_writer_is_pinned_to_primary(self):
+        self.run_request(lambda request: self.router.db_for_write(Recipe),
+                         'post')
+        routes = []
+
+        def view(request):
+            use_replica(request)
+            routes.append(self.router.db_for_read(Recipe))
+
+        self.run_request(view)
+        # Закрепление истекло.
+        cache.clear()
+        self.run_request(view)
+        self.assertEqual(routes, [PRIMARY, REPLICA])
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaReadTests(TransactionTestCase):
+    """Запросы API к реплике и основной базе.
+
+    Реплика - ещё одно соединение с тестовой базой, как реплики из
+    DB_REPLICA_HOSTS с TEST MIRROR. Данные видны ей только после commit,
+    поэтому TransactionTestCase.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # После setUpClass: иначе TransactionTestCase запретил бы
+        # запросы к соединению, которого нет в databases.
+        connections.databases[REPLICA] = {
+            **connections.databases[PRIMARY],
+            'TEST': {'MIRROR': PRIMARY},
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA].close()
+        del connections.databases[REPLICA]
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Иван', last_name='Петров', password=None)
+        self.auth = {
+            'HTTP_AUTHORIZATION':
+                f'Token {Token.objects.create(user=self.user).key}',
+        }
+        self.recipe = Recipe.objects.create(
+            author=self.user, name='Суп', image='recipes/images/soup.png',
+            text='Сварить.', cooking_time=10)
+
+    def get_recipes(self, **extra):
+        """Число запросов к основной базе и реплике."""
+        with CaptureQueriesContext(connections[PRIMARY]) as primary, \
+                CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = self.client.get('/api/recipes/', **extra)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+        return len(primary), len(replica)
+
+    def test_anonymous_reads_replica(self):
+        primary, replica = self.get_recipes()
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_reads_after_write_use_primary(self):
+        self.assertGreater(self.get_recipes(**self.auth)[1], 0)
+        response = self.client.post(
+            f'/api/recipes/{self.recipe.id}/favorite/', **self.auth)
+        self.assertEqual(response.status_code, 201)
+        primary, replica = self.get_recipes(**self.auth)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+        # Остальные пользователи читают с реплики.
+        self.assertEqual(self.get_recipes()[0], 0)
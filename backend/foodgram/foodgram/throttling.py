@@ -0,0 +1,150 @@
+"""Ограничение частоты запросов по алгоритму token bucket.
+
+Ведро ёмкостью N токенов из ставки ``N/период`` пополняется равномерно,
+поэтому клиент может сделать N запросов подряд, а дальше - не чаще
+ставки. Состояние ведра (токены, время) хранится в кэше
+``settings.THROTTLE_CACHE``. Если кэш не настроен или недоступен,
+используется словарь процесса: запись кортежа в словарь атомарна под GIL,
+поэтому блокировки не нужны (гонка потоков может потерять списание токена,
+но не заблокирует запрос).
+
+Ключ ведра - пользователь, а для анонимных запросов - IP-адрес.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+logger = logging.getLogger(__name__)
+
+MAX_LOCAL_BUCKETS = 10000
+
+_local_buckets = {}
+
+
+class LocalBuckets:
+    """Хранилище вёдер в памяти процесса без блокировок.
+
+    Устаревшее ведро не мешает: за время простоя оно пополняется до полного.
+    Чтобы словарь не рос бесконечно, при переполнении он очищается.
+    """
+
+    def get(self, key):
+        return _local_buckets.get(key)
+
+    def set(self, key, value, timeout):
+        if len(_local_buckets) >= MAX_LOCAL_BUCKETS:
+            _local_buckets.clear()
+        _local_buckets[key] = value
+
+
+local_buckets = LocalBuckets()
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def __init__(self):
+        # Ставки читаются при каждом запросе, а не при импорте, чтобы их
+        # можно было переопределить через override_settings.
+        self.THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+        super().__init__()
+
+    def get_rate(self):
+        return self.THROTTLE_RATES.get(self.scope)
+
+    def get_cache_key(self, request, view):
+        if request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def get_bucket(self):
+        if settings.THROTTLE_CACHE:
+            try:
+                return caches[settings.THROTTLE_CACHE].get(self.key)
+            except Exception:
+                logger.warning('Throttle cache is unavailable, using '
+                               'in-process buckets.', exc_info=True)
+        return local_buckets.get(self.key)
+
+    def set_bucket(self, tokens):
+        value = (tokens, self.now)
+        if settings.THROTTLE_CACHE:
+            try:
+                caches[settings.THROTTLE_CACHE].set(self.key, value,
+                                                    self.duration)
+                return
+            except Exception:
+                logger.warning('Throttle cache is unavailable, using '
+                               'in-process buckets.', exc_info=True)
+        local_buckets.set(self.key, value, self.duration)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.now = self.timer()
+        refill = self.num_requests / self.duration
+        bucket = self.get_bucket()
+        if bucket is None:
+            tokens = self.num_requests
+        else:
+            tokens, updated = bucket
+            tokens = min(self.num_requests,
+                         tokens + (self.now - updated) * refill)
+        self.tokens = tokens
+        if tokens < 1:
+            return False
+        self.set_bucket(tokens - 1)
+        return True
+
+    def wait(self):
+        refill = self.num_requests / self.duration
+        return (1 - self.tokens) / refill
+
+
+class AnonReadThrottle(TokenBucketThrottle):
+    """Чтения анонимных клиентов по IP."""
+
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if (request.user.is_authenticated
+                or request.method not in SAFE_METHODS):
+            return None
+        return super().get_cache_key(request, view)
+
+
+class WriteThrottle(TokenBucketThrottle):
+    """Изменяющие запросы: избранное, список покупок, подписки, рецепты."""
+
+    scope = 'writes'
+
+    def get_cache_key(self, request, view):
+        if request.method in SAFE_METHODS:
+            return None
+        return super().get_cache_key(request, view)
+
+
+class ExportThrottle(TokenBucketThrottle):
+    """Выгрузка списка покупок в PDF."""
+
+    scope = 'export'
+
+    def get_cache_key(self, request, view):
+        if request.method not in SAFE_METHODS:
+            return None
+        return super().get_cache_key(request, view)
+
+
+class LoginThrottle(TokenBucketThrottle):
+    """Получение токена: всегда по IP, пользователь ещё не известен."""
+
+    scope = 'login'
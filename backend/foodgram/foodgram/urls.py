@@ -16,9 +16,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from .memory import MemoryView
+
 urlpatterns = [
     path("api/", include("recipes.urls")),
     path("api/", include("users.urls")),
+    path("api/memory/", MemoryView.as_view(), name="memory"),
 
     path("admin/", admin.site.urls),
 ]
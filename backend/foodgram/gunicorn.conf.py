@@ -0,0 +1,61 @@
+import os
+
+bind = os.getenv('GUNICORN_BIND', default='0:8000')
+
+if hasattr(os, 'sched_getaffinity'):
+    cpu_count = len(os.sched_getaffinity(0))
+else:
+    cpu_count = os.cpu_count()
+workers = int(os.getenv('GUNICORN_WORKERS', default=cpu_count * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', default=2))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS',
+                         default='gthread' if threads > 1 else 'sync')
+
+# Приложение загружается в мастер-процессе до fork: воркеры стартуют
+# быстрее и разделяют память с мастером.
+preload_app = True
+
+# Перезапуск воркеров против накопления памяти; jitter разносит рестарты.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', default=1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER',
+                                    default=100))
+# Тот же перезапуск, если после запроса RSS воркера больше
+# GUNICORN_MAX_RSS_MB мегабайт (0 - не проверять).
+max_rss_mb = int(os.getenv('GUNICORN_MAX_RSS_MB', default=0))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', default=30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', default=30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', default=5))
+
+accesslog = os.getenv('GUNICORN_ACCESSLOG', default=None)
+
+
+def post_request(worker, req, environ, resp):
+    if not max_rss_mb:
+        return
+    # Модуль проекта: при вызове хука приложение уже загружено.
+    from foodgram.memory import get_rss
+
+    rss = get_rss()
+    if rss > max_rss_mb * 1024 * 1024:
+        worker.log.info('Worker RSS %d MB exceeds %d MB, restarting',
+                        rss // (1024 * 1024), max_rss_mb)
+        # Как при max_requests: воркер завершит текущие запросы и выйдет.
+        worker.alive = False
+
+
+def post_fork(server, worker):
+    from django.conf import settings
+
+    if not settings.WARM_ON_STARTUP:
+        return
+    # Соединения открываются после fork: у каждого воркера свои.
+    from django.db import DatabaseError
+
+    from recipes.warmup import warm_connections
+
+    try:
+        warm_connections()
+    except DatabaseError as error:
+        # Недоступная база не должна мешать воркеру запуститься.
+        worker.log.warning('Worker could not warm connections: %s', error)
@@ -1,16 +1,61 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.template.defaultfilters import truncatechars
+from django.utils.html import format_html
 
+from . import shopping_list
 from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
-                     ShoppingCart, Tag)
+                     ShoppingCart, ShoppingListItem, SlowQuery, Tag,
+                     TrendingRecipe)
+
+
+class LoadedAutocompleteSelect(AutocompleteSelect):
+    """AutocompleteSelect, который берёт подпись выбранного значения из
+    уже загруженного объекта loaded, а не запросом на каждую строку
+    инлайна."""
+
+    loaded = None
+
+    def optgroups(self, name, value, attr=None):
+        if self.loaded is None or value != [str(self.loaded.pk)]:
+            return super().optgroups(name, value, attr)
+        label = self.choices.field.label_from_instance(self.loaded)
+        option = self.create_option(name, self.loaded.pk, label, True, 0)
+        return [(None, [option], 0)]
+
+
+class IngredientInRecipeForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.ingredient_id is not None:
+            # Ингредиент загружен select_related в get_queryset инлайна.
+            widget = self.fields['ingredient'].widget
+            getattr(widget, 'widget', widget).loaded = (
+                self.instance.ingredient)
 
 
 class IngredientInRecipeInline(admin.TabularInline):
     model = IngredientInRecipe
+    form = IngredientInRecipeForm
     min_num = 1
-    list_display = (
+    fields = (
         'ingredient',
         'amount',
     )
+    autocomplete_fields = ('ingredient',)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'ingredient':
+            kwargs['widget'] = LoadedAutocompleteSelect(
+                db_field, self.admin_site, using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'recipe__author', 'ingredient')
 
 
 class RecipeAdmin(admin.ModelAdmin):
@@ -18,23 +63,180 @@ class RecipeAdmin(admin.ModelAdmin):
         'id',
         'name',
         'author',
-        'recipe_count',
+        'favorites_count',
     )
-    list_filter = ('name', 'author', 'tags')
+    list_filter = ('tags',)
+    list_select_related = ('author',)
+    search_fields = ('name', 'author__username')
+    autocomplete_fields = ('author', 'tags')
+    show_full_result_count = False
     inlines = (IngredientInRecipeInline,)
 
+    def get_queryset(self, request):
+        # Подзапрос считается только для строк текущей страницы, а
+        # GROUP BY по всей таблице рецептов не нужен.
+        favorites = (
+            Favorite.objects.filter(recipe=OuterRef('pk')).order_by()
+            .values('recipe').annotate(count=Count('id')).values('count')
+        )
+        return super().get_queryset(request).annotate(
+            favorites_count=Coalesce(
+                Subquery(favorites, output_field=IntegerField()), 0))
+
+    @admin.display(description='В избранном', ordering='favorites_count')
+    def favorites_count(self, recipe):
+        return recipe.favorites_count
+
+    def save_related(self, request, form, formsets, change):
+        if not change:
+            return super().save_related(request, form, formsets, change)
+        with shopping_list.changing_ingredients(form.instance.id):
+            super().save_related(request, form, formsets, change)
+
+
+class IngredientInRecipeAdmin(admin.ModelAdmin):
+    list_display = ('recipe', 'ingredient', 'amount')
+    list_select_related = ('recipe__author', 'ingredient')
+    search_fields = ('recipe__name', 'ingredient__name')
+    autocomplete_fields = ('recipe', 'ingredient')
+    show_full_result_count = False
+
+    def save_model(self, request, obj, form, change):
+        recipe_ids = {obj.recipe_id}
+        if change:
+            recipe_ids.add(form.initial['recipe'])
+        super().save_model(request, obj, form, change)
+        shopping_list.rebuild_recipes(recipe_ids)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        shopping_list.rebuild_recipes([obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        super().delete_queryset(request, queryset)
+        shopping_list.rebuild_recipes(recipe_ids)
+
+
+class RelationAdmin(admin.ModelAdmin):
+    list_display = ('user', 'recipe', 'created')
+    list_select_related = ('user', 'recipe__author')
+    search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
+    show_full_result_count = False
+
+
+class ShoppingCartAdmin(RelationAdmin):
+    def save_model(self, request, obj, form, change):
+        user_ids = {obj.user_id}
+        if change:
+            user_ids.add(form.initial['user'])
+        super().save_model(request, obj, form, change)
+        shopping_list.rebuild(user_ids)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        shopping_list.rebuild([obj.user_id])
+
+    def delete_queryset(self, request, queryset):
+        user_ids = set(queryset.values_list('user_id', flat=True))
+        super().delete_queryset(request, queryset)
+        shopping_list.rebuild(user_ids)
+
+
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'amount')
+    list_select_related = ('user', 'ingredient')
+    search_fields = ('user__username',)
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class TrendingRecipeAdmin(admin.ModelAdmin):
+    list_display = ('rank', 'recipe', 'score')
+    list_select_related = ('recipe__author',)
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('created', 'duration_ms', 'occurrences', 'database',
+                    'call_site', 'short_sql')
+    list_filter = ('database',)
+    search_fields = ('=fingerprint', 'call_site', 'sql')
+    fields = ('created', 'duration', 'database', 'call_site', 'fingerprint',
+              'sql', 'plan_text')
+    readonly_fields = ('plan_text',)
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Сколько раз запрос с тем же отпечатком есть в буфере.
+        occurrences = (
+            SlowQuery.objects.filter(fingerprint=OuterRef('fingerprint'))
+            .order_by().values('fingerprint').annotate(count=Count('id'))
+            .values('count')
+        )
+        return super().get_queryset(request).annotate(
+            occurrences=Subquery(occurrences, output_field=IntegerField()))
+
+    @admin.display(description='Длительность, мс', ordering='duration')
+    def duration_ms(self, query):
+        return f'{query.duration:.1f}'
+
+    @admin.display(description='Повторов', ordering='occurrences')
+    def occurrences(self, query):
+        return query.occurrences
+
+    @admin.display(description='Запрос')
+    def short_sql(self, query):
+        return truncatechars(query.sql, 120)
+
+    @admin.display(description='План')
+    def plan_text(self, query):
+        return format_html('<pre>{}</pre>', query.plan)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 
 class IngredientAdmin(admin.ModelAdmin):
     list_display = (
         'name',
         'measurement_unit',
     )
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
+    search_fields = ('^name',)
+    show_full_result_count = False
+
+
+class TagAdmin(admin.ModelAdmin):
+    list_display = (
+        'name',
+        'color',
+        'slug',
+    )
+    search_fields = ('name', 'slug')
 
 
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
-admin.site.register(Tag)
-admin.site.register(IngredientInRecipe)
-admin.site.register(Favorite)
-admin.site.register(ShoppingCart)
+admin.site.register(Tag, TagAdmin)
+admin.site.register(IngredientInRecipe, IngredientInRecipeAdmin)
+admin.site.register(Favorite, RelationAdmin)
+admin.site.register(ShoppingCart, ShoppingCartAdmin)
+admin.site.register(ShoppingListItem, ShoppingListItemAdmin)
+admin.site.register(TrendingRecipe, TrendingRecipeAdmin)
+admin.site.register(SlowQuery, SlowQueryAdmin)
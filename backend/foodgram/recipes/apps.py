@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        from . import signals, slow_queries  # noqa: F401
+        if settings.WARM_ON_STARTUP:
+            from .warmup import warm_process
+            warm_process()
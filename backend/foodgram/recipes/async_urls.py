@@ -0,0 +1,13 @@
+from django.urls import path
+
+from .async_views import (favorite, ingredient_list, recipe_detail,
+                          shopping_cart, tag_list)
+
+urlpatterns = [
+    path('tags/', tag_list, name='tags-list'),
+    path('ingredients/', ingredient_list, name='ingredients-list'),
+    path('recipes/<int:pk>/', recipe_detail, name='recipes-detail'),
+    path('recipes/<int:recipe_id>/favorite/', favorite, name='favorite'),
+    path('recipes/<int:recipe_id>/shopping_cart/', shopping_cart,
+         name='shopping_cart'),
+]
@@ -0,0 +1,52 @@
+"""Асинхронные обёртки для самых нагруженных представлений.
+
+При запуске через ASGI синхронные представления Django 3.2 выполняются в
+одном общем потоке. Эти обёртки выполняют существующие DRF-представления в
+ограниченном пуле потоков (``ASYNC_DB_THREADS``), поэтому медленные клиенты
+и загрузка тела запроса не занимают поток, а запросы обрабатываются
+параллельно. Django 3.2 не имеет асинхронного ORM, поэтому работа с базой
+идёт через ``sync_to_async``.
+"""
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from foodgram.executor import executor
+from foodgram.middleware import check_connections
+
+from .views import (FavoriteView, IngredientsViewSet, RecipeViewSet,
+                    ShoppingCardView, TagViewSet)
+
+
+def run_in_executor(view):
+    def render(request, *args, **kwargs):
+        close_old_connections()
+        check_connections()
+        try:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            return response
+        finally:
+            close_old_connections()
+
+    render_async = sync_to_async(render, thread_sensitive=False,
+                                 executor=executor)
+
+    async def async_view(request, *args, **kwargs):
+        return await render_async(request, *args, **kwargs)
+
+    async_view.csrf_exempt = getattr(view, 'csrf_exempt', False)
+    return async_view
+
+
+tag_list = run_in_executor(TagViewSet.as_view({'get': 'list'}))
+ingredient_list = run_in_executor(
+    IngredientsViewSet.as_view({'get': 'list'}))
+recipe_detail = run_in_executor(RecipeViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+}))
+favorite = run_in_executor(FavoriteView.as_view())
+shopping_cart = run_in_executor(ShoppingCardView.as_view())
@@ -0,0 +1,352 @@
+"""Выгрузка и загрузка коллекций пользователей в NDJSON.
+
+Одна строка - один объект ``{"type": ..., ...}``. Строки идут в порядке
+meta, tag, user, recipe, favorite, shopping_cart, follow: загрузчик
+опирается на него, чтобы к моменту ссылки на объект его новый id был уже
+известен. Пользователи, теги и ингредиенты связываются по естественным
+ключам (username, slug, название и единица измерения), рецепты - по id из
+выгрузки, а если рецепта в выгрузке нет - по автору и названию.
+
+Выгрузка читает базу порциями (``iterator(chunk_size)``, рецепты - по
+возрастанию id), загрузка вставляет объекты ``bulk_create`` порциями, так
+что память не зависит от объёма данных, кроме таблиц соответствия id
+пользователей и рецептов. Загрузка идёт в одной транзакции: при ошибке в
+любой строке база остаётся без изменений.
+
+Пароли не выгружаются: загруженные пользователи получают непригодный
+пароль и входят после его сброса.
+"""
+from collections import Counter
+
+import orjson
+from django.contrib.auth import get_user_model
+from django.db import connections, router, transaction
+
+from users.follows import reconcile
+from users.models import Follow
+
+from . import page_cache, shopping_list
+from .memberships import invalidate_memberships
+from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                     ShoppingCart, Tag)
+
+User = get_user_model()
+
+FORMAT_VERSION = 1
+CHUNK_SIZE = 2000
+BATCH_SIZE = 1000
+ORDER = ('tag', 'user', 'recipe', 'favorite', 'shopping_cart', 'follow')
+RELATIONS = {'favorite': Favorite, 'shopping_cart': ShoppingCart}
+USER_FIELDS = ('username', 'email', 'first_name', 'last_name')
+
+
+class CollectionError(ValueError):
+    pass
+
+
+def dumps(record):
+    return orjson.dumps(record) + b'\n'
+
+
+def recipe_chunks(recipes, chunk_size):
+    """Рецепты порциями по возрастанию id с тегами и ингредиентами:
+    prefetch_related не работает с iterator(), поэтому порции
+    выбираются по условию id > последнего id предыдущей порции."""
+    recipes = (
+        recipes.select_related('author')
+        .prefetch_related('tags', 'ingredient_to_recipe__ingredient')
+        .order_by('id')
+    )
+    last_id = 0
+    while True:
+        chunk = list(recipes.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1].id
+
+
+def export_lines(user_ids=None, chunk_size=CHUNK_SIZE):
+    """Строки NDJSON коллекций пользователей user_ids (всех, если None)."""
+    yield dumps({'type': 'meta', 'version': FORMAT_VERSION})
+    users = User.objects.all()
+    tags = Tag.objects.all()
+    recipes = Recipe.objects.all()
+    relations = {name: model.objects.all()
+                 for name, model in RELATIONS.items()}
+    follows = Follow.objects.all()
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+        tags = tags.filter(recipes__author_id__in=user_ids).distinct()
+        recipes = recipes.filter(author_id__in=user_ids)
+        relations = {name: queryset.filter(user_id__in=user_ids)
+                     for name, queryset in relations.items()}
+        follows = follows.filter(user_id__in=user_ids)
+    for name, color, slug in tags.order_by('id').values_list(
+            'name', 'color', 'slug').iterator(chunk_size=chunk_size):
+        yield dumps({'type': 'tag', 'name': name, 'color': color,
+                     'slug': slug})
+    for values in users.order_by('id').values_list(*USER_FIELDS).iterator(
+            chunk_size=chunk_size):
+        yield dumps({'type': 'user', **dict(zip(USER_FIELDS, values))})
+    for chunk in recipe_chunks(recipes, chunk_size):
+        for recipe in chunk:
+            yield dumps({
+                'type': 'recipe',
+                'id': recipe.id,
+                'author': recipe.author.username,
+                'name': recipe.name,
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+                'image': recipe.image.name,
+                'tags': [tag.slug for tag in recipe.tags.all()],
+                'ingredients': [
+                    [item.ingredient.name, item.ingredient.measurement_unit,
+                     item.amount]
+                    for item in recipe.ingredient_to_recipe.all()
+                ],
+            })
+    for name, queryset in relations.items():
+        rows = queryset.order_by('id').values_list(
+            'user__username', 'recipe_id', 'recipe__author__username',
+            'recipe__name',
+        ).iterator(chunk_size=chunk_size)
+        for username, recipe_id, author, recipe_name in rows:
+            yield dumps({'type': name, 'user': username,
+                         'recipe': recipe_id, 'recipe_author': author,
+                         'recipe_name': recipe_name})
+    for username, author in follows.order_by('id').values_list(
+            'user__username', 'author__username').iterator(
+                chunk_size=chunk_size):
+        yield dumps({'type': 'follow', 'user': username, 'author': author})
+
+
+class Importer:
+    """Загружает строки export_lines порциями по batch_size объектов.
+
+    Существующие пользователи (по username), теги (по slug) и ингредиенты
+    (по названию и единице) не изменяются, а используются; рецепты всегда
+    создаются заново, связи с уже существующими связями пропускаются.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.connection = connections[router.db_for_write(Recipe)]
+        self.pending = {name: [] for name in ORDER}
+        self.users = {}
+        self.tags = {}
+        self.ingredients = {}
+        self.recipes = {}
+        self.changed_users = set()
+        self.cart_users = set()
+        self.follow_users = set()
+        self.stats = Counter()
+
+    def load(self, lines):
+        with transaction.atomic(using=self.connection.alias):
+            self.read(lines)
+            self.finish()
+        # Кэш сбрасывается после фиксации, иначе его успели бы заполнить
+        # старыми данными.
+        invalidate_memberships(self.changed_users)
+        page_cache.invalidate()
+        return dict(self.stats)
+
+    def read(self, lines):
+        for number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = orjson.loads(line)
+                kind = record.pop('type')
+            except (orjson.JSONDecodeError, AttributeError, KeyError):
+                raise CollectionError(
+                    f'Строка {number}: не объект с полем type.')
+            if kind == 'meta':
+                if record.get('version') != FORMAT_VERSION:
+                    raise CollectionError(
+                        f'Строка {number}: неизвестная версия формата '
+                        f'{record.get("version")}.')
+                continue
+            if kind not in self.pending:
+                raise CollectionError(
+                    f'Строка {number}: неизвестный тип {kind}.')
+            self.pending[kind].append(record)
+            if len(self.pending[kind]) >= self.batch_size:
+                self.flush()
+        self.flush()
+
+    def finish(self):
+        """Пересчитывает то, что обычно обновляют переключатели и сигналы:
+        списки покупок и счётчики подписок."""
+        cart_users = list(self.cart_users)
+        for start in range(0, len(cart_users), self.batch_size):
+            shopping_list.rebuild(cart_users[start:start + self.batch_size])
+        follow_users = list(self.follow_users)
+        for start in range(0, len(follow_users), self.batch_size):
+            reconcile(follow_users[start:start + self.batch_size])
+
+    def flush(self):
+        for kind in ORDER:
+            records = self.pending[kind]
+            if records:
+                getattr(self, f'import_{kind}s')(records)
+                records.clear()
+
+    def resolve(self, cache, queryset, field, keys):
+        """Дополняет cache id объектов queryset по значениям field."""
+        missing = {key for key in keys if key not in cache}
+        if missing:
+            cache.update(queryset.filter(**{f'{field}__in': missing})
+                         .values_list(field, 'id'))
+        return cache
+
+    def import_tags(self, records):
+        self.resolve(self.tags, Tag.objects, 'slug',
+                     [record['slug'] for record in records])
+        new = [Tag(name=record['name'], color=record['color'],
+                   slug=record['slug'])
+               for record in records if record['slug'] not in self.tags]
+        Tag.objects.bulk_create(new, ignore_conflicts=True)
+        self.resolve(self.tags, Tag.objects, 'slug',
+                     [tag.slug for tag in new])
+        self.stats['tag'] += sum(tag.slug in self.tags for tag in new)
+
+    def import_users(self, records):
+        self.resolve(self.users, User.objects, 'username',
+                     [record['username'] for record in records])
+        new = [User(**{field: record[field] for field in USER_FIELDS})
+               for record in records if record['username'] not in self.users]
+        for user in new:
+            user.set_unusable_password()
+        User.objects.bulk_create(new, ignore_conflicts=True)
+        self.resolve(self.users, User.objects, 'username',
+                     [user.username for user in new])
+        created = sum(user.username in self.users for user in new)
+        self.stats['user'] += created
+        self.stats['user_skipped'] += len(new) - created
+
+    def get_ingredient_ids(self, records):
+        pairs = {tuple(item[:2]) for record in records
+                 for item in record['ingredients']}
+        missing = {pair for pair in pairs if pair not in self.ingredients}
+        if missing:
+            rows = Ingredient.objects.filter(
+                name__in={name for name, _ in missing}).order_by('-id')
+            for name, unit, id in rows.values_list(
+                    'name', 'measurement_unit', 'id'):
+                if (name, unit) in missing:
+                    self.ingredients[(name, unit)] = id
+            new = [Ingredient(name=name, measurement_unit=unit)
+                   for name, unit in missing if (name, unit)
+                   not in self.ingredients]
+            if new:
+                self.save(Ingredient, new)
+                self.ingredients.update(
+                    ((ingredient.name, ingredient.measurement_unit),
+                     ingredient.id) for ingredient in new)
+        return self.ingredients
+
+    def save(self, model, objects):
+        """Вставляет объекты и заполняет их id. Django 3.2 получает id из
+        bulk_create только на PostgreSQL, на остальных базах объекты
+        сохраняются по одному."""
+        if self.connection.features.can_return_rows_from_bulk_insert:
+            model.objects.bulk_create(objects, batch_size=self.batch_size)
+        else:
+            for instance in objects:
+                instance.save(force_insert=True)
+
+    def import_recipes(self, records):
+        self.resolve(self.users, User.objects, 'username',
+                     [record['author'] for record in records])
+        records = [record for record in records
+                   if record['author'] in self.users]
+        ingredients = self.get_ingredient_ids(records)
+        recipes = [
+            Recipe(author_id=self.users[record['author']],
+                   name=record['name'], text=record['text'],
+                   cooking_time=record['cooking_time'],
+                   image=record['image'])
+            for record in records
+        ]
+        self.save(Recipe, recipes)
+        items = []
+        tags = []
+        for record, recipe in zip(records, recipes):
+            self.recipes[record['id']] = recipe.id
+            items.extend(
+                IngredientInRecipe(recipe_id=recipe.id,
+                                   ingredient_id=ingredients[(name, unit)],
+                                   amount=amount)
+                for name, unit, amount in record['ingredients'])
+            tags.extend(
+                Recipe.tags.through(recipe_id=recipe.id,
+                                    tag_id=self.tags[slug])
+                for slug in record['tags'] if slug in self.tags)
+        IngredientInRecipe.objects.bulk_create(
+            items, batch_size=self.batch_size, ignore_conflicts=True)
+        Recipe.tags.through.objects.bulk_create(
+            tags, batch_size=self.batch_size, ignore_conflicts=True)
+        self.stats['recipe'] += len(recipes)
+
+    def get_recipe_id(self, record, by_name):
+        recipe_id = self.recipes.get(record['recipe'])
+        if recipe_id is None:
+            return by_name.get((record['recipe_author'],
+                                record['recipe_name']))
+        return recipe_id
+
+    def import_relations(self, kind, records):
+        self.resolve(self.users, User.objects, 'username',
+                     [record['user'] for record in records])
+        unknown = [record for record in records
+                   if record['recipe'] not in self.recipes]
+        by_name = {}
+        if unknown:
+            rows = Recipe.objects.filter(
+                author__username__in={record['recipe_author']
+                                      for record in unknown},
+                name__in={record['recipe_name'] for record in unknown},
+            ).order_by('-id').values_list('author__username', 'name', 'id')
+            by_name = {(author, name): id for author, name, id in rows}
+        model = RELATIONS[kind]
+        objects = []
+        for record in records:
+            user_id = self.users.get(record['user'])
+            recipe_id = self.get_recipe_id(record, by_name)
+            if user_id is None or recipe_id is None:
+                self.stats[f'{kind}_skipped'] += 1
+                continue
+            objects.append(model(user_id=user_id, recipe_id=recipe_id))
+            self.changed_users.add(user_id)
+            if model is ShoppingCart:
+                self.cart_users.add(user_id)
+        model.objects.bulk_create(objects, batch_size=self.batch_size,
+                                  ignore_conflicts=True)
+        self.stats[kind] += len(objects)
+
+    def import_favorites(self, records):
+        self.import_relations('favorite', records)
+
+    def import_shopping_carts(self, records):
+        self.import_relations('shopping_cart', records)
+
+    def import_follows(self, records):
+        self.resolve(self.users, User.objects, 'username',
+                     [name for record in records
+                      for name in (record['user'], record['author'])])
+        objects = []
+        for record in records:
+            user_id = self.users.get(record['user'])
+            author_id = self.users.get(record['author'])
+            if user_id is None or author_id is None or user_id == author_id:
+                self.stats['follow_skipped'] += 1
+                continue
+            objects.append(Follow(user_id=user_id, author_id=author_id))
+            self.changed_users.add(user_id)
+            self.follow_users.update((user_id, author_id))
+        Follow.objects.bulk_create(objects, batch_size=self.batch_size,
+                                   ignore_conflicts=True)
+        self.stats['follow'] += len(objects)
@@ -0,0 +1,182 @@
+"""Сериализаторы только для чтения без полей DRF.
+
+Каждый сериализатор повторяет вывод одного из сериализаторов DRF (тот же
+``Meta``, те же ключи в том же порядке), но строит словари обычными
+функциями: методы доступа к полям собираются один раз при создании
+сериализатора, а не для каждого объекта. Включаются настройкой
+``FAST_SERIALIZERS``; совпадение вывода проверяют тесты
+(recipes.tests.FastSerializerTests) и, на данных окружения, команда
+``verify_fast_serializers``.
+"""
+from operator import attrgetter
+
+from django.conf import settings
+from rest_framework import serializers
+
+from users.serializers import (VISIBLE_QUANTITY, AuthorCardSerializer,
+                               FollowingRecipeSerializer,
+                               SubscriptionsSerializer, UserSerializer)
+
+from .memberships import get_memberships
+from .serializers import (FavoriteSerializer, RecipeCardSerializer,
+                          RecipeSerializer)
+
+
+def select(accessors, fields):
+    return tuple((name, accessors[name]) for name in fields)
+
+
+def to_dict(accessors, instance):
+    return {name: accessor(instance) for name, accessor in accessors}
+
+
+def image_getter(request):
+    def get_image(instance):
+        value = instance.image
+        if not value:
+            return None
+        if request is None:
+            return value.url
+        return request.build_absolute_uri(value.url)
+    return get_image
+
+
+def user_accessors(memberships):
+    return {
+        'id': attrgetter('id'),
+        'email': attrgetter('email'),
+        'username': attrgetter('username'),
+        'first_name': attrgetter('first_name'),
+        'last_name': attrgetter('last_name'),
+        'is_subscribed': lambda user: user.id in memberships.following,
+    }
+
+
+def user_getter(fields, memberships):
+    accessors = select(user_accessors(memberships), fields)
+    return lambda user: to_dict(accessors, user)
+
+
+def get_tags(recipe):
+    return [
+        {'id': tag.id, 'name': tag.name, 'color': tag.color,
+         'slug': tag.slug}
+        for tag in recipe.tags.all()
+    ]
+
+
+def get_ingredients(recipe):
+    return [
+        {'id': item.ingredient.id, 'name': item.ingredient.name,
+         'measurement_unit': item.ingredient.measurement_unit,
+         'amount': item.amount}
+        for item in recipe.ingredient_to_recipe.all()
+    ]
+
+
+class FastSerializer(serializers.BaseSerializer):
+    """Базовый класс: подкласс задаёт Meta.fields и метод get_accessors(),
+    возвращающий словарь «имя поля -> функция от объекта»; без них
+    подкласс не создаётся."""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if not callable(getattr(cls, 'get_accessors', None)):
+            raise TypeError(f'{cls.__name__}: не задан get_accessors().')
+        if not hasattr(getattr(cls, 'Meta', None), 'fields'):
+            raise TypeError(f'{cls.__name__}: не задан Meta.fields.')
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        accessors = self.get_accessors()
+        self.accessors = select(accessors, (
+            name for name in self.Meta.fields
+            if fields is None or name in fields
+        ))
+
+    def to_representation(self, instance):
+        return to_dict(self.accessors, instance)
+
+
+class FastFavoriteSerializer(FastSerializer):
+    Meta = FavoriteSerializer.Meta
+
+    def get_accessors(self):
+        return {
+            'id': attrgetter('id'),
+            'name': attrgetter('name'),
+            'image': image_getter(self.context.get('request')),
+            'cooking_time': attrgetter('cooking_time'),
+        }
+
+
+class FastRecipeSerializer(FastSerializer):
+    Meta = RecipeSerializer.Meta
+    author_fields = UserSerializer.Meta.fields
+
+    def get_accessors(self):
+        request = self.context['request']
+        memberships = get_memberships(request)
+        get_author = user_getter(self.author_fields, memberships)
+        return {
+            'id': attrgetter('id'),
+            'tags': get_tags,
+            'author': lambda recipe: get_author(recipe.author),
+            'ingredients': get_ingredients,
+            'is_favorited': lambda recipe: recipe.id in memberships.favorites,
+            'is_in_shopping_cart':
+                lambda recipe: recipe.id in memberships.shopping_cart,
+            'name': attrgetter('name'),
+            'image': image_getter(request),
+            'text': attrgetter('text'),
+            'cooking_time': attrgetter('cooking_time'),
+        }
+
+
+class FastRecipeCardSerializer(FastRecipeSerializer):
+    Meta = RecipeCardSerializer.Meta
+    author_fields = AuthorCardSerializer.Meta.fields
+
+
+class FastSubscriptionsSerializer(FastSerializer):
+    Meta = SubscriptionsSerializer.Meta
+
+    def get_accessors(self):
+        # Как и FollowingRecipeSerializer, рецепты без контекста запроса:
+        # ссылки на картинки относительные.
+        recipe_accessors = select({
+            'id': attrgetter('id'),
+            'name': attrgetter('name'),
+            'image': image_getter(None),
+            'cooking_time': attrgetter('cooking_time'),
+        }, FollowingRecipeSerializer.Meta.fields)
+
+        def get_recipes(author):
+            return [to_dict(recipe_accessors, recipe)
+                    for recipe in author.recipes.all()[:VISIBLE_QUANTITY]]
+
+        def get_recipes_count(author):
+            if hasattr(author, 'recipes_count'):
+                return author.recipes_count
+            return author.recipes.count()
+
+        return {
+            **user_accessors(get_memberships(self.context['request'])),
+            'recipes': get_recipes,
+            'recipes_count': get_recipes_count,
+        }
+
+
+FAST_SERIALIZERS = {
+    FavoriteSerializer: FastFavoriteSerializer,
+    RecipeSerializer: FastRecipeSerializer,
+    RecipeCardSerializer: FastRecipeCardSerializer,
+    SubscriptionsSerializer: FastSubscriptionsSerializer,
+}
+
+
+def fast(serializer_class):
+    """Быстрый аналог serializer_class, если он включён настройкой."""
+    if settings.FAST_SERIALIZERS:
+        return FAST_SERIALIZERS.get(serializer_class, serializer_class)
+    return serializer_class
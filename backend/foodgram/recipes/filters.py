@@ -23,13 +23,13 @@ class RecipeFilter(filters.FilterSet):
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
         if value:
-            return Recipe.objects.filter(favorite__user=user)
+            return queryset.filter(favorite__user=user)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         user = self.request.user
         if value:
-            return Recipe.objects.filter(shopping_cart__user=user)
+            return queryset.filter(shopping_cart__user=user)
         return queryset
 
     class Meta:
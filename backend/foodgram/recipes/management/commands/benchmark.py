@@ -0,0 +1,368 @@
+import json
+import platform
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from recipes.memberships import Memberships
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.serializers import RecipeSerializer
+from users.models import Follow
+
+User = get_user_model()
+
+PERCENTILES = (50, 95, 99)
+INGREDIENT_PREFIX_LENGTH = 2
+BATCH_SIZE = 20
+ABUSE_STEP = ('get', '/api/recipes/download_shopping_cart/', {}, True)
+FULL_FIELDS = ','.join(RecipeSerializer.Meta.fields)
+
+
+def percentile(values, rank):
+    ordered = sorted(values)
+    index = max(0, round(rank / 100 * len(ordered) + 0.5) - 1)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+class CaptureAllQueries(ExitStack):
+    def __enter__(self):
+        super().__enter__()
+        self.contexts = [
+            self.enter_context(CaptureQueriesContext(connection))
+            for connection in connections.all()
+        ]
+        return self
+
+    def __len__(self):
+        return sum(len(context) for context in self.contexts)
+
+
+class InProcessTransport:
+    """Запросы через тестовый клиент Django с подсчётом запросов к БД."""
+
+    counts_queries = True
+
+    def __init__(self, token):
+        self.token = token
+        self.local = threading.local()
+
+    def get_client(self, authenticated):
+        if not hasattr(self.local, 'clients'):
+            self.local.clients = {
+                True: Client(HTTP_AUTHORIZATION=f'Token {self.token}'),
+                False: Client(),
+            }
+        return self.local.clients[authenticated]
+
+    def send(self, method, path, params, authenticated):
+        client = self.get_client(authenticated)
+        if method == 'get':
+            response = client.get(path, params)
+        else:
+            response = getattr(client, method)(
+                path, params, content_type='application/json')
+        if response.streaming:
+            body = b''.join(response.streaming_content)
+        else:
+            body = response.content
+        return response.status_code, len(body)
+
+
+class HttpTransport:
+    """Запросы по HTTP к запущенному серверу (gunicorn, uvicorn)."""
+
+    counts_queries = False
+
+    def __init__(self, token, base_url):
+        self.token = token
+        self.base_url = base_url.rstrip('/')
+
+    def send(self, method, path, params, authenticated):
+        url = self.base_url + path
+        headers = (
+            {'Authorization': f'Token {self.token}'} if authenticated else {})
+        data = None
+        if method == 'get' and params:
+            url += '?' + urlencode(params)
+        elif params:
+            data = json.dumps(params).encode()
+            headers['Content-Type'] = 'application/json'
+        request = Request(url, data=data, method=method.upper(),
+                          headers=headers)
+        try:
+            with urlopen(request) as response:
+                return response.status, len(response.read())
+        except HTTPError as error:
+            return error.code, len(error.read())
+
+
+class Abuse:
+    """Фоновые потоки, без пауз запрашивающие выгрузку PDF от имени
+    другого пользователя, пока идут замеры."""
+
+    def __init__(self, transport, threads):
+        self.transport = transport
+        self.threads = [threading.Thread(target=self.run, daemon=True)
+                        for _ in range(threads)]
+        self.stopped = threading.Event()
+        self.statuses = Counter()
+
+    def run(self):
+        while not self.stopped.is_set():
+            status, _ = self.transport.send(*ABUSE_STEP)
+            self.statuses[status] += 1
+
+    def __enter__(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+
+    def report(self):
+        return {
+            'threads': len(self.threads),
+            'requests': sum(self.statuses.values()),
+            'statuses': dict(sorted(self.statuses.items())),
+        }
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет основные эндпоинты API и сохраняет перцентили '
+            'задержек, пропускную способность и число запросов к БД в JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Число параллельных клиентов.')
+        parser.add_argument('--base-url',
+                            help='Адрес запущенного сервера, например '
+                            'http://127.0.0.1:8000. По умолчанию запросы '
+                            'выполняются внутри процесса.')
+        parser.add_argument('--output', default='benchmark.json')
+        parser.add_argument('--user', help='username пользователя, от '
+                            'имени которого выполняются запросы.')
+        parser.add_argument('--scenario', action='append',
+                            help='Запустить только указанные сценарии.')
+        parser.add_argument('--throttle', action='store_true',
+                            help='Не отключать ограничение частоты запросов '
+                            'при замерах внутри процесса.')
+        parser.add_argument('--abuse', type=int, default=0,
+                            help='Число потоков, параллельно без пауз '
+                            'выгружающих PDF от имени другого пользователя.')
+
+    def handle(self, *args, **options):
+        self.user = self.get_user(options['user'])
+        self.transport = self.get_transport(self.user, options['base_url'])
+        scenarios = self.get_scenarios()
+        if options['scenario']:
+            unknown = set(options['scenario']) - set(scenarios)
+            if unknown:
+                raise CommandError(
+                    f'Неизвестные сценарии: {", ".join(sorted(unknown))}')
+            scenarios = {name: scenarios[name]
+                         for name in options['scenario']}
+        results = {}
+        with ExitStack() as stack:
+            if not options['base_url'] and not options['throttle']:
+                stack.enter_context(override_settings(REST_FRAMEWORK={
+                    **settings.REST_FRAMEWORK,
+                    'DEFAULT_THROTTLE_RATES': {},
+                }))
+            abuse = None
+            if options['abuse']:
+                abuse = stack.enter_context(Abuse(
+                    self.get_transport(self.get_abuser(),
+                                       options['base_url']),
+                    options['abuse']))
+            for name, steps in scenarios.items():
+                results[name] = self.run_scenario(
+                    steps, options['iterations'], options['warmup'],
+                    options['concurrency'])
+                self.write_result(name, results[name])
+        report = {
+            'meta': self.get_meta(options),
+            'scenarios': results,
+        }
+        if abuse is not None:
+            report['abuse'] = abuse.report()
+            self.stdout.write(f'abuse: {report["abuse"]}')
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f'Результаты сохранены в {options["output"]}'))
+
+    def get_user(self, username):
+        users = User.objects.filter(recipes__isnull=False).distinct()
+        if username:
+            users = User.objects.filter(username=username)
+        user = users.order_by('id').first()
+        if user is None:
+            raise CommandError('Нет данных: запустите generate_data.')
+        return user
+
+    def get_abuser(self):
+        user = (
+            User.objects.exclude(id=self.user.id)
+            .filter(shopping_cart__isnull=False).order_by('id').first()
+        )
+        if user is None:
+            raise CommandError('Нет второго пользователя со списком покупок.')
+        return user
+
+    def get_transport(self, user, base_url):
+        token, _ = Token.objects.get_or_create(user=user)
+        if base_url:
+            return HttpTransport(token.key, base_url)
+        return InProcessTransport(token.key)
+
+    def get_scenarios(self):
+        """Сценарий - последовательность шагов (метод, путь, параметры,
+        нужна ли авторизация), замеряемая как одно обращение."""
+        recipe = Recipe.objects.order_by('-id').first()
+        if recipe is None:
+            raise CommandError('Нет рецептов: запустите generate_data.')
+        toggle_recipe = (
+            Recipe.objects.exclude(favorite__user=self.user)
+            .exclude(shopping_cart__user=self.user)
+            .order_by('id').first()
+        ) or recipe
+        tag = Tag.objects.order_by('id').first()
+        ingredient = Ingredient.objects.order_by('id').first()
+        prefix = (
+            ingredient.name[:INGREDIENT_PREFIX_LENGTH] if ingredient else '')
+        favorite_url = f'/api/recipes/{toggle_recipe.id}/favorite/'
+        cart_url = f'/api/recipes/{toggle_recipe.id}/shopping_cart/'
+        batch = {'recipes': list(
+            Recipe.objects.exclude(shopping_cart__user=self.user)
+            .order_by('id').values_list('id', flat=True)[:BATCH_SIZE])}
+        scenarios = {
+            'recipes_list': [('get', '/api/recipes/', {}, True)],
+            'recipes_list_anonymous': [('get', '/api/recipes/', {}, False)],
+            'recipes_list_full': [
+                ('get', '/api/recipes/', {'fields': FULL_FIELDS}, True)],
+            'recipes_list_sparse': [
+                ('get', '/api/recipes/', {'fields': 'id,name,image'}, True)],
+            'recipes_list_author': [
+                ('get', '/api/recipes/', {'author': recipe.author_id}, True)],
+            'recipes_list_favorited': [
+                ('get', '/api/recipes/', {'is_favorited': 1}, True)],
+            'recipes_list_in_shopping_cart': [
+                ('get', '/api/recipes/', {'is_in_shopping_cart': 1}, True)],
+            'recipe_detail': [
+                ('get', f'/api/recipes/{recipe.id}/', {}, True)],
+            'recipe_similar': [
+                ('get', f'/api/recipes/{recipe.id}/similar/', {}, True)],
+            'tags_list': [('get', '/api/tags/', {}, True)],
+            'users_list': [('get', '/api/users/', {}, True)],
+            'users_list_cursor': [
+                ('get', '/api/users/', {'cursor': self.user.id}, True)],
+            'user_detail': [
+                ('get', f'/api/users/{recipe.author_id}/', {}, True)],
+            'user_followers': [
+                ('get', f'/api/users/{recipe.author_id}/followers/', {},
+                 True)],
+            'ingredients_search': [
+                ('get', '/api/ingredients/', {'name': prefix}, True)],
+            'subscriptions': [
+                ('get', '/api/users/subscriptions/', {}, True)],
+            'favorite_toggle': [('post', favorite_url, {}, True),
+                                ('delete', favorite_url, {}, True)],
+            'shopping_cart_toggle': [('post', cart_url, {}, True),
+                                     ('delete', cart_url, {}, True)],
+            'shopping_cart_batch_toggle': [
+                ('post', '/api/recipes/shopping_cart/', batch, True),
+                ('delete', '/api/recipes/shopping_cart/', batch, True)],
+            'download_shopping_cart': [
+                ('get', '/api/recipes/download_shopping_cart/', {}, True)],
+            'recipes_trending': [
+                ('get', '/api/recipes/trending/', {}, False)],
+            'shopping_list': [
+                ('get', '/api/recipes/shopping_list/', {}, True)],
+        }
+        if tag is not None:
+            scenarios['recipes_list_tags'] = [
+                ('get', '/api/recipes/', {'tags': tag.slug}, True)]
+        return scenarios
+
+    def measure(self, steps):
+        with CaptureAllQueries() as captured:
+            started = time.perf_counter()
+            responses = [self.transport.send(*step) for step in steps]
+            elapsed = (time.perf_counter() - started) * 1000
+        return elapsed, len(captured), responses
+
+    def run_scenario(self, steps, iterations, warmup, concurrency):
+        for _ in range(warmup):
+            self.measure(steps)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = list(executor.map(lambda _: self.measure(steps),
+                                        range(iterations)))
+        wall_time = time.perf_counter() - started
+        timings = [elapsed for elapsed, _, _ in samples]
+        queries = [count for _, count, _ in samples]
+        sizes = [sum(size for _, size in responses)
+                 for _, _, responses in samples]
+        result = {
+            f'p{rank}_ms': round(percentile(timings, rank), 3)
+            for rank in PERCENTILES
+        }
+        counts_queries = self.transport.counts_queries
+        result.update(
+            mean_ms=round(sum(timings) / len(timings), 3),
+            throughput_rps=round(iterations / wall_time, 1),
+            queries_min=min(queries) if counts_queries else None,
+            queries_max=max(queries) if counts_queries else None,
+            bytes_mean=round(sum(sizes) / len(sizes)),
+            statuses=sorted({status for _, _, responses in samples
+                             for status, _ in responses}),
+        )
+        return result
+
+    def write_result(self, name, result):
+        self.stdout.write(
+            f'{name:32} '
+            + ' '.join(f'p{rank}={result[f"p{rank}_ms"]:8.2f}ms'
+                       for rank in PERCENTILES)
+            + f' rps={result["throughput_rps"]:7.1f}'
+            + f' queries={result["queries_max"]}'
+            + f' bytes={result["bytes_mean"]} '
+            f'status={",".join(map(str, result["statuses"]))}'
+        )
+
+    def get_meta(self, options):
+        return {
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'database': connections['default'].vendor,
+            'target': options['base_url'] or 'in-process',
+            'iterations': options['iterations'],
+            'concurrency': options['concurrency'],
+            'throttle': bool(options['base_url'] or options['throttle']),
+            'user': self.user.username,
+            'memberships_bytes': Memberships.load(self.user.id).nbytes,
+            'rows': {
+                model.__name__: model.objects.count()
+                for model in (User, Follow, Recipe, Ingredient, Tag,
+                              Favorite, ShoppingCart)
+            },
+        }
@@ -0,0 +1,52 @@
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from recipes.pdf import get_widths, render_shopping_list
+
+
+class Command(BaseCommand):
+    help = ('Измеряет время и пик памяти (tracemalloc) построения PDF со '
+            'списком покупок из синтетических строк.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=10000,
+                            help='Число строк списка.')
+        parser.add_argument('--name-length', type=int, default=80,
+                            help='Длина названия ингредиента, символов.')
+        parser.add_argument('--spool-max-size', type=int, default=None,
+                            help='Размер PDF в памяти до сброса на диск.')
+
+    def handle(self, *args, **options):
+        # Шрифт регистрируется один раз на процесс, в замер не входит.
+        get_widths.cache_clear()
+        render_shopping_list(self.items(1, options['name_length']))
+        kwargs = {}
+        if options['spool_max_size'] is not None:
+            kwargs['spool_max_size'] = options['spool_max_size']
+        items = (options['lines'], options['name_length'])
+        # Время и память меряются разными прогонами: tracemalloc замедляет
+        # рендер в несколько раз.
+        started = time.perf_counter()
+        output, size = render_shopping_list(self.items(*items), **kwargs)
+        elapsed = time.perf_counter() - started
+        output.close()
+        tracemalloc.start()
+        output, _ = render_shopping_list(self.items(*items), **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        output.close()
+        self.stdout.write(
+            f'lines={options["lines"]} time={elapsed:.2f}s '
+            f'peak={peak / 1024 / 1024:.1f}MB pdf={size / 1024:.0f}KB')
+
+    def items(self, count, name_length):
+        for number in range(count):
+            name = f'ингредиент номер {number} ' * name_length
+            yield {
+                'name': name[:name_length],
+                'amount': Decimal(number % 997) / 4,
+                'measurement_unit': 'г',
+            }
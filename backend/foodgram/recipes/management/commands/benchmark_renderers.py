@@ -0,0 +1,101 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from foodgram.middleware import brotli
+from foodgram.renderers import ORJSONRenderer
+from recipes.fast_serializers import FAST_SERIALIZERS
+from recipes.models import Recipe
+from recipes.serializers import RecipeSerializer
+
+from .benchmark import PERCENTILES, percentile
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает сериализаторы, рендереры JSON и сжатие на полных '
+            'представлениях рецептов; с --output сохраняет результаты в JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100,
+                            help='Число рецептов в одном ответе.')
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--output',
+                            help='Файл для результатов в JSON, «-» - '
+                                 'стандартный вывод.')
+
+    def handle(self, *args, **options):
+        recipes = self.get_recipes(options['recipes'])
+        context = {'request': Request(RequestFactory().get('/api/recipes/'))}
+        results = {}
+        for name, serializer_class in (
+                ('drf', RecipeSerializer),
+                ('fast', FAST_SERIALIZERS[RecipeSerializer])):
+            results[name] = self.measure(
+                lambda: serializer_class(recipes, many=True,
+                                         context=context).data,
+                options['iterations'])
+        data = RecipeSerializer(recipes, many=True, context=context).data
+        renderers = {
+            'json': JSONRenderer(),
+            'orjson': ORJSONRenderer(),
+        }
+        bodies = {}
+        for name, renderer in renderers.items():
+            bodies[name] = renderer.render(data)
+            results[name] = self.measure(
+                lambda: renderer.render(data), options['iterations'])
+            results[name]['bytes'] = len(bodies[name])
+        if bodies['json'] != bodies['orjson']:
+            if json.loads(bodies['json']) != json.loads(bodies['orjson']):
+                raise CommandError('Рендереры вернули разные данные.')
+        body = bodies['orjson']
+        compressors = {'gzip': compress_string}
+        if brotli is not None:
+            compressors['br'] = lambda content: brotli.compress(
+                content, mode=brotli.MODE_TEXT,
+                quality=settings.COMPRESSION_BROTLI_QUALITY)
+        for name, compress in compressors.items():
+            results[name] = self.measure(
+                lambda: compress(body), options['iterations'])
+            results[name]['bytes'] = len(compress(body))
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:8} '
+                + ' '.join(f'p{rank}={result[f"p{rank}_ms"]:8.3f}ms'
+                           for rank in PERCENTILES)
+                + f' bytes={result.get("bytes", "-")}')
+        report = {'recipes': options['recipes'], 'results': results}
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(report, ensure_ascii=False,
+                                         indent=2))
+        elif options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f'Результаты сохранены в {options["output"]}'))
+
+    def get_recipes(self, count):
+        recipes = list(
+            Recipe.objects.select_related('author')
+            .prefetch_related('tags', 'ingredient_to_recipe__ingredient')
+            [:count])
+        if not recipes:
+            raise CommandError('Нет рецептов: запустите generate_data.')
+        return recipes
+
+    def measure(self, function, iterations):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - started) * 1000)
+        return {
+            f'p{rank}_ms': round(percentile(timings, rank), 3)
+            for rank in PERCENTILES
+        }
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes import similarity
+
+
+class Command(BaseCommand):
+    help = ('Строит таблицу похожих рецептов по совместному добавлению в '
+            'избранное и общим ингредиентам.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--neighbors', type=int,
+                            default=similarity.NEIGHBORS,
+                            help='Похожих рецептов на рецепт.')
+        parser.add_argument('--block-size', type=int,
+                            default=similarity.BLOCK_SIZE,
+                            help='Рецептов в одном блоке вычислений.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = similarity.rebuild(options['neighbors'],
+                                   options['block_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Сохранено {count} пар похожих рецептов, '
+            f'{time.perf_counter() - started:.1f} с.'))
@@ -0,0 +1,57 @@
+import time
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from .benchmark import CaptureAllQueries
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Открывает список и форму изменения каждой модели админки и '
+            'проверяет, что число запросов к БД не зависит от объёма '
+            'данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-queries', type=int, default=8,
+                            help='Допустимое число запросов на список.')
+        parser.add_argument('--max-change-queries', type=int, default=20,
+                            help='Допустимое число запросов на форму.')
+
+    def handle(self, *args, **options):
+        superuser = User.objects.filter(is_superuser=True).first()
+        if superuser is None:
+            raise CommandError('Нет суперпользователя: создайте его '
+                               'командой createsuperuser.')
+        client = Client()
+        client.force_login(superuser)
+        failed = []
+        for model, model_admin in admin.site._registry.items():
+            info = (model._meta.app_label, model._meta.model_name)
+            urls = [(reverse('admin:%s_%s_changelist' % info),
+                     options['max_queries'])]
+            instance = model_admin.get_queryset(None).order_by('pk').first()
+            if instance is not None:
+                urls.append((reverse('admin:%s_%s_change' % info,
+                                     args=(instance.pk,)),
+                             options['max_change_queries']))
+            for url, max_queries in urls:
+                started = time.perf_counter()
+                with CaptureAllQueries() as queries:
+                    status = client.get(url).status_code
+                elapsed = (time.perf_counter() - started) * 1000
+                self.stdout.write(f'{url:50} status={status} '
+                                  f'queries={len(queries):3} '
+                                  f'{elapsed:8.1f}ms')
+                if status != 200 or len(queries) > max_queries:
+                    failed.append(url)
+        if failed:
+            raise CommandError('Ошибка или слишком много запросов: '
+                               + ', '.join(failed))
+        self.stdout.write(self.style.SUCCESS(
+            f'Не больше {options["max_queries"]} запросов на список и '
+            f'{options["max_change_queries"]} на форму изменения.'))
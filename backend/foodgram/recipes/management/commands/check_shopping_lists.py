@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import shopping_list
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает сохранённые списки покупок с пересчитанными по '
+            'рецептам в списке покупок; с --fix пересчитывает расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Пересчитать списки с расхождениями.')
+
+    def handle(self, *args, **options):
+        expected = shopping_list.expected_items()
+        actual = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount
+            in ShoppingListItem.objects.values_list(
+                'user_id', 'ingredient_id', 'amount').iterator()
+        }
+        user_ids = {
+            user_id for user_id, _ in expected.keys() ^ actual.keys()
+        } | {
+            key[0] for key in expected.keys() & actual.keys()
+            if expected[key] != actual[key]
+        }
+        if not user_ids:
+            self.stdout.write(self.style.SUCCESS(
+                f'Списки покупок совпадают: {len(actual)} строк.'))
+            return
+        self.stdout.write(
+            f'Расхождения у {len(user_ids)} пользователей: '
+            f'{", ".join(map(str, sorted(user_ids)[:20]))}')
+        if not options['fix']:
+            raise CommandError('Списки покупок не совпадают, '
+                               'запустите с --fix.')
+        shopping_list.rebuild(user_ids)
+        self.stdout.write(self.style.SUCCESS('Списки покупок пересчитаны.'))
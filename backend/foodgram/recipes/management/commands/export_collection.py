@@ -0,0 +1,28 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from recipes.collection import CHUNK_SIZE, export_lines
+
+
+class Command(BaseCommand):
+    help = ('Выгружает рецепты, избранное, списки покупок и подписки '
+            'пользователей в NDJSON, читая базу порциями.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append',
+                            dest='user_ids',
+                            help='id пользователя (по умолчанию - все).')
+        parser.add_argument('--output', default='-',
+                            help='Файл NDJSON, «-» - стандартный вывод.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        lines = export_lines(options['user_ids'], options['chunk_size'])
+        if options['output'] == '-':
+            sys.stdout.buffer.writelines(lines)
+            return
+        with open(options['output'], 'wb') as file:
+            file.writelines(lines)
+        self.stdout.write(self.style.SUCCESS(
+            f'Коллекции сохранены в {options["output"]}'))
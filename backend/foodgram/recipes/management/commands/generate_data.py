@@ -0,0 +1,202 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from recipes import shopping_list
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, Tag)
+from users.follows import reconcile
+from users.models import Follow
+
+User = get_user_model()
+
+DEFAULT_PASSWORD = 'benchmark-password'
+DEFAULT_IMAGE = 'recipes/images/063ebaaf-3a6c-4b05-a05b-94db0b2ffc9a.png'
+MAX_AMOUNT = 100
+MAX_COOKING_TIME = 600
+
+
+class Command(BaseCommand):
+    help = ('Генерирует синтетические данные заданного масштаба '
+            'для нагрузочного тестирования.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--follows', type=int, default=5,
+                            help='Подписок на пользователя.')
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients', type=int, default=2000,
+                            help='Минимальное число ингредиентов в базе.')
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--tags', type=int, default=5)
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Избранных рецептов на пользователя.')
+        parser.add_argument('--carts', type=int, default=5,
+                            help='Рецептов в списке покупок на пользователя.')
+        parser.add_argument('--prefix', default='bench',
+                            help='Префикс имён создаваемых объектов.')
+        parser.add_argument('--history-days', type=int, default=14,
+                            help='За сколько дней распределить даты '
+                                 'добавления в избранное и списки покупок.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+        with transaction.atomic():
+            tag_ids = self.step('tags', self.create_tags,
+                                prefix, options['tags'])
+            ingredient_ids = self.step('ingredients', self.create_ingredients,
+                                       prefix, options['ingredients'])
+            user_ids = self.step('users', self.create_users,
+                                 prefix, options['users'])
+            recipe_ids = self.step(
+                'recipes', self.create_recipes, prefix, options['recipes'],
+                user_ids, tag_ids, ingredient_ids,
+                options['ingredients_per_recipe'],
+            )
+            self.step('follows', self.create_relations, Follow, 'author_id',
+                      user_ids, user_ids, options['follows'])
+            self.step('follow counts', reconcile)
+            self.step('favorites', self.create_relations, Favorite,
+                      'recipe_id', user_ids, recipe_ids, options['favorites'])
+            self.step('shopping carts', self.create_relations, ShoppingCart,
+                      'recipe_id', user_ids, recipe_ids, options['carts'])
+            self.step('shopping lists', shopping_list.rebuild, user_ids,
+                      self.batch_size)
+            self.step('history', self.spread_history, user_ids,
+                      options['history_days'])
+
+    def step(self, title, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        self.stdout.write(
+            f'{title}: {time.perf_counter() - started:.2f} с')
+        return result
+
+    def create_tags(self, prefix, count):
+        Tag.objects.bulk_create(
+            [
+                Tag(name=f'{prefix} тег {number}',
+                    slug=f'{prefix}-tag-{number}',
+                    color=f'#{self.rng.randrange(16 ** 6):06X}')
+                for number in range(count)
+            ],
+            ignore_conflicts=True,
+        )
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def create_ingredients(self, prefix, count):
+        missing = count - Ingredient.objects.count()
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(name=f'{prefix} ингредиент {number}',
+                           measurement_unit=self.rng.choice(
+                               ('г', 'кг', 'мл', 'шт.', 'ст. л.')))
+                for number in range(max(missing, 0))
+            ),
+            batch_size=self.batch_size,
+        )
+        return list(Ingredient.objects.values_list('id', flat=True))
+
+    def create_users(self, prefix, count):
+        password = make_password(DEFAULT_PASSWORD)
+        User.objects.bulk_create(
+            (
+                User(username=f'{prefix}_user_{number}',
+                     email=f'{prefix}_user_{number}@example.com',
+                     first_name='Имя', last_name='Фамилия',
+                     password=password)
+                for number in range(count)
+            ),
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        return list(
+            User.objects.filter(username__startswith=f'{prefix}_user_')
+            .values_list('id', flat=True)
+        )
+
+    def create_recipes(self, prefix, count, user_ids, tag_ids,
+                       ingredient_ids, per_recipe):
+        Recipe.objects.bulk_create(
+            (
+                Recipe(author_id=self.rng.choice(user_ids),
+                       name=f'{prefix} рецепт {number}',
+                       image=DEFAULT_IMAGE,
+                       text='Описание рецепта. ' * 20,
+                       cooking_time=self.rng.randint(1, MAX_COOKING_TIME))
+                for number in range(count)
+            ),
+            batch_size=self.batch_size,
+        )
+        recipe_ids = list(
+            Recipe.objects.filter(name__startswith=f'{prefix} рецепт ')
+            .values_list('id', flat=True)
+        )
+        per_recipe = min(per_recipe, len(ingredient_ids))
+        IngredientInRecipe.objects.bulk_create(
+            (
+                IngredientInRecipe(recipe_id=recipe_id,
+                                   ingredient_id=ingredient_id,
+                                   amount=self.rng.randint(1, MAX_AMOUNT))
+                for recipe_id in recipe_ids
+                for ingredient_id in self.rng.sample(ingredient_ids,
+                                                     per_recipe)
+            ),
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        through = Recipe.tags.through
+        through.objects.bulk_create(
+            (
+                through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in self.rng.sample(
+                    tag_ids, self.rng.randint(min(1, len(tag_ids)),
+                                              min(3, len(tag_ids))))
+            ),
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        return recipe_ids
+
+    def spread_history(self, user_ids, days):
+        """Раскладывает created избранного и списков покупок по последним
+        days дням интервалами по часу."""
+        if days <= 0:
+            return
+        now = timezone.now()
+        hours = days * 24
+        for model in (Favorite, ShoppingCart):
+            by_hour = {}
+            for id in model.objects.filter(user_id__in=user_ids).values_list(
+                    'id', flat=True).iterator(chunk_size=self.batch_size):
+                by_hour.setdefault(self.rng.randrange(hours), []).append(id)
+            for hour, ids in by_hour.items():
+                for start in range(0, len(ids), self.batch_size):
+                    model.objects.filter(
+                        id__in=ids[start:start + self.batch_size],
+                    ).update(created=now - timedelta(hours=hour))
+
+    def create_relations(self, model, target_field, user_ids, target_ids,
+                         per_user):
+        per_user = min(per_user, len(target_ids))
+        model.objects.bulk_create(
+            (
+                model(user_id=user_id, **{target_field: target_id})
+                for user_id in user_ids
+                for target_id in self.rng.sample(target_ids, per_user)
+                if target_id != user_id or model is not Follow
+            ),
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
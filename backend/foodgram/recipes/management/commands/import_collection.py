@@ -0,0 +1,29 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.collection import BATCH_SIZE, CollectionError, Importer
+
+
+class Command(BaseCommand):
+    help = ('Загружает коллекции из NDJSON команды export_collection '
+            'порциями с пересчётом id.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input',
+                            help='Файл NDJSON, «-» - стандартный ввод.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        importer = Importer(options['batch_size'])
+        try:
+            if options['input'] == '-':
+                stats = importer.load(sys.stdin.buffer)
+            else:
+                with open(options['input'], 'rb') as file:
+                    stats = importer.load(file)
+        except CollectionError as error:
+            raise CommandError(error)
+        for name, count in sorted(stats.items()):
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(self.style.SUCCESS('Коллекции загружены.'))
@@ -0,0 +1,91 @@
+import os
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+# То, что воркер загружает до первого ответа: WSGI-приложение с
+# middleware и URL-конфигурация со всеми вьюхами.
+WORKER_IMPORTS = (
+    'import foodgram.wsgi\n'
+    'from django.urls import get_resolver\n'
+    'get_resolver().url_patterns\n'
+)
+PREFIX = 'import time:'
+
+
+def parse(output):
+    """Строки -X importtime: [(модуль, собственное, суммарное время в
+    мкс, глубина вложенности)]."""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith(PREFIX):
+            continue
+        own, total, name = line[len(PREFIX):].split('|')
+        if not own.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), int(own), int(total), depth))
+    return modules
+
+
+class Command(BaseCommand):
+    help = ('Запускает импорт приложения так, как его выполняет воркер, '
+            'с python -X importtime и выводит самые тяжёлые модули и '
+            'пакеты; с --forbid падает, если импортирован запрещённый '
+            'пакет.')
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15)
+        parser.add_argument('--forbid', action='append', default=[],
+                            metavar='PACKAGE',
+                            help='Пакет, который не должен загружаться '
+                                 'при старте; можно указать несколько раз.')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', WORKER_IMPORTS],
+            env=env, stderr=subprocess.PIPE, universal_newlines=True,
+        )
+        elapsed = time.perf_counter() - started
+        if result.returncode:
+            raise CommandError(result.stderr)
+        modules = parse(result.stderr)
+        imported = sum(total for _, _, total, depth in modules if not depth)
+        max_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        self.stdout.write(
+            f'Модулей: {len(modules)}, импорт: {imported / 1000:.0f} мс, '
+            f'процесс: {elapsed * 1000:.0f} мс, '
+            f'max RSS: {max_rss / 1024:.0f} МБ')
+        self.write_top(
+            'Пакеты (собственное время модулей)',
+            self.by_package(modules).most_common(options['top']))
+        self.write_top(
+            'Модули (с вложенными импортами)',
+            sorted(((name, total) for name, _, total, _ in modules),
+                   key=lambda item: -item[1])[:options['top']])
+        forbidden = sorted({
+            name.split('.')[0] for name, *_ in modules
+        } & set(options['forbid']))
+        if forbidden:
+            raise CommandError(
+                f'При старте загружаются запрещённые модули: '
+                f'{", ".join(forbidden)}')
+
+    def by_package(self, modules):
+        packages = Counter()
+        for name, own, _, _ in modules:
+            packages[name.split('.')[0]] += own
+        return packages
+
+    def write_top(self, title, rows):
+        self.stdout.write(f'\n{title}:')
+        for name, microseconds in rows:
+            self.stdout.write(f'{microseconds / 1000:9.1f} мс  {name}')
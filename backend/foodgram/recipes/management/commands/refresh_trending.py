@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes import trending
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рейтинг популярных рецептов по избранному и '
+            'спискам покупок с убывающим по времени весом.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = trending.refresh()
+        self.stdout.write(self.style.SUCCESS(
+            f'В рейтинге {count} рецептов, '
+            f'{time.perf_counter() - started:.2f} с.'))
@@ -0,0 +1,86 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from recipes.fast_serializers import FAST_SERIALIZERS
+from recipes.models import Recipe
+from recipes.serializers import (FavoriteSerializer, RecipeCardSerializer,
+                                 RecipeSerializer)
+from users.serializers import SubscriptionsSerializer
+from users.views import ListSubscriptions
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает вывод быстрых сериализаторов с сериализаторами DRF '
+            'на случайных пользователях, рецептах и наборах полей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=100)
+        parser.add_argument('--batch', type=int, default=20,
+                            help='Объектов в одной выборке.')
+        parser.add_argument('--seed', type=int)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.renderer = JSONRenderer()
+        user_ids = list(User.objects.values_list('id', flat=True))
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        if not user_ids or not recipe_ids:
+            raise CommandError('Нет данных: запустите generate_data.')
+        batch = options['batch']
+        for _ in range(options['samples']):
+            request = self.get_request(rng.choice(user_ids + [None]))
+            ids = rng.sample(recipe_ids, min(batch, len(recipe_ids)))
+            recipes = Recipe.objects.filter(id__in=ids)
+            if rng.random() < 0.5:
+                recipes = recipes.select_related('author').prefetch_related(
+                    'tags', 'ingredient_to_recipe__ingredient')
+            for serializer_class in (RecipeSerializer, RecipeCardSerializer):
+                fields = serializer_class.Meta.fields
+                self.compare(serializer_class, recipes, request,
+                             fields=rng.sample(fields,
+                                               rng.randint(1, len(fields))))
+                self.compare(serializer_class, recipes, request)
+            self.compare(SubscriptionsSerializer, User.objects.filter(
+                id__in=rng.sample(user_ids, min(batch, len(user_ids)))),
+                request)
+            if request.user.is_authenticated:
+                self.compare(SubscriptionsSerializer, ListSubscriptions(
+                    request=request).get_queryset(), request)
+            self.compare(FavoriteSerializer, rng.choice(list(recipes)),
+                         request, many=False)
+        self.stdout.write(self.style.SUCCESS(
+            f'Совпадают все {options["samples"]} выборок.'))
+
+    def get_request(self, user_id):
+        request = Request(RequestFactory().get('/api/recipes/'))
+        if user_id is not None:
+            request.user = User.objects.get(id=user_id)
+        return request
+
+    def compare(self, serializer_class, instance, request, many=True,
+                **kwargs):
+        context = {'request': request}
+        if many:
+            # Один и тот же порядок объектов для обоих сериализаторов.
+            instance = list(instance)
+        expected = self.renderer.render(serializer_class(
+            instance, many=many, context=context, **kwargs).data)
+        actual = self.renderer.render(FAST_SERIALIZERS[serializer_class](
+            instance, many=many, context=context, **kwargs).data)
+        if expected != actual:
+            start = next(
+                (index for index, (left, right)
+                 in enumerate(zip(expected, actual)) if left != right),
+                min(len(expected), len(actual)),
+            )
+            raise CommandError(
+                f'{serializer_class.__name__} {kwargs}: вывод отличается с '
+                f'байта {start}\nDRF:     {expected[start:start + 200]}'
+                f'\nбыстрый: {actual[start:start + 200]}')
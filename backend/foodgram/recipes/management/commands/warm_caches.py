@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.warmup import WarmupError, warm_shared
+
+
+class Command(BaseCommand):
+    help = ('Прогревает общий кэш после деплоя: справочники, первые '
+            'страницы ленты и пользователей, популярные рецепты. Требует '
+            'общего для воркеров CACHE_BACKEND и WARM_URL.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=3,
+                            help='Сколько первых страниц ленты рецептов и '
+                                 'пользователей запросить.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            steps = warm_shared(options['pages'])
+        except WarmupError as error:
+            raise CommandError(error)
+        for title, seconds in steps:
+            self.stdout.write(f'{title}: {seconds * 1000:.1f} мс')
+        self.stdout.write(self.style.SUCCESS(
+            f'Прогрев занял {time.perf_counter() - started:.2f} с'))
@@ -0,0 +1,31 @@
+# Generated by Django 3.2 on 2026-10-19 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_similar_recipes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Время')),
+                ('database', models.CharField(max_length=100, verbose_name='База')),
+                ('duration', models.FloatField(verbose_name='Длительность, мс')),
+                ('fingerprint', models.CharField(db_index=True, max_length=32, verbose_name='Отпечаток')),
+                ('sql', models.TextField(verbose_name='Запрос')),
+                ('call_site', models.CharField(max_length=255, verbose_name='Место вызова')),
+                ('plan', models.TextField(blank=True, verbose_name='План')),
+            ],
+            options={
+                'verbose_name': 'Медленный запрос',
+                'verbose_name_plural': 'Медленные запросы',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
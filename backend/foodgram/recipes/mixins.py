@@ -0,0 +1,106 @@
+from calendar import timegm
+from hashlib import blake2b
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework import permissions
+from rest_framework.exceptions import ValidationError
+
+from foodgram.db_router import use_replica
+
+from .memberships import get_memberships
+
+
+class ReplicaReadMixin:
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in permissions.SAFE_METHODS:
+            use_replica(request)
+
+
+class SparseFieldsMixin:
+    """Разреженные наборы полей: ?fields=id,name или ?omit=text.
+
+    fields выбирает поля из всех полей сериализатора, omit убирает поля из
+    представления по умолчанию. Имена omit, которых в представлении нет
+    (например, text в ленте из карточек), пропускаются: одни и те же
+    параметры подходят и для ленты, и для страницы рецепта. Сериализатор
+    должен принимать аргумент fields, а get_queryset - учитывать
+    get_sparse_fields(), чтобы не загружать из базы то, что не попадёт в
+    ответ.
+    """
+
+    fields_param = 'fields'
+    omit_param = 'omit'
+
+    def parse_fields_param(self, param, available=None):
+        """Имена полей из параметра; если передан available, другие имена
+        - ошибка 400."""
+        value = self.request.query_params.get(param)
+        if value is None:
+            return None
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = set(names) - set(names if available is None else available)
+        if unknown:
+            raise ValidationError({param: [
+                f'Неизвестные поля: {", ".join(sorted(unknown))}.']})
+        return names
+
+    def get_sparse_fields(self):
+        """Имена полей ответа для безопасных методов, иначе None."""
+        if self.request.method not in permissions.SAFE_METHODS:
+            return None
+        if not hasattr(self, '_sparse_fields'):
+            fields = self.get_serializer_class().Meta.fields
+            selected = self.parse_fields_param(self.fields_param, fields)
+            omitted = self.parse_fields_param(self.omit_param) or ()
+            self._sparse_fields = tuple(
+                name for name in fields
+                if (selected is None or name in selected)
+                and name not in omitted
+            )
+        return self._sparse_fields
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
+
+
+class ConditionalGetMixin:
+    """Условные GET-запросы без сериализации.
+
+    Представление вычисляет дешёвое состояние данных (например, max(updated)
+    и число объектов) и вызывает not_modified(); при совпадении ETag или
+    If-Modified-Since сразу возвращается 304. ETag учитывает адрес запроса,
+    формат ответа и множества пользователя (избранное, список покупок,
+    подписки), поэтому Last-Modified отдаётся только анонимам.
+    """
+
+    validators = None
+
+    def not_modified(self, last_modified, *state):
+        request = self.request
+        parts = [request.get_full_path(), request.accepted_media_type,
+                 last_modified and last_modified.isoformat(), *state]
+        if request.user.is_authenticated:
+            parts.append(get_memberships(request).fingerprint)
+            last_modified = None
+        digest = blake2b(':'.join(map(str, parts)).encode(), digest_size=16)
+        etag = 'W/' + quote_etag(digest.hexdigest())
+        timestamp = last_modified and timegm(last_modified.utctimetuple())
+        self.validators = etag, timestamp
+        return get_conditional_response(request, etag=etag,
+                                        last_modified=timestamp)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args,
+                                             **kwargs)
+        if self.validators and response.status_code in (200, 304):
+            etag, timestamp = self.validators
+            response['ETag'] = etag
+            if timestamp:
+                response['Last-Modified'] = http_date(timestamp)
+            patch_vary_headers(response, ('Authorization',))
+        return response
@@ -87,6 +87,15 @@ class Recipe(models.Model):
         related_name='recipes',
         through='IngredientInRecipe',
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания',
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Дата изменения',
+    )
 
     def recipe_count(self):
         return self.favorite.count()
@@ -146,6 +155,11 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт'
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата добавления',
+    )
 
     class Meta:
         ordering = ['-id']
@@ -173,6 +187,11 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт',
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата добавления',
+    )
 
     class Meta:
         ordering = ['-id']
@@ -187,3 +206,147 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} - {self.recipe}'
+
+
+class TrendingRecipe(models.Model):
+    """Место рецепта в рейтинге популярных, пересчитывается командой
+    refresh_trending."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        related_name='trending',
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+    )
+    score = models.FloatField(
+        verbose_name='Популярность',
+    )
+    rank = models.PositiveIntegerField(
+        db_index=True,
+        verbose_name='Место',
+    )
+
+    class Meta:
+        ordering = ['rank']
+        verbose_name = 'Популярный рецепт'
+        verbose_name_plural = 'Популярные рецепты'
+
+    def __str__(self):
+        return f'{self.rank}. {self.recipe_id}'
+
+
+class SimilarRecipe(models.Model):
+    """Похожий рецепт: соседи по совместному добавлению в избранное, а
+    если их меньше нужного - по общим ингредиентам. Строится командой
+    build_similar_recipes."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name='similar_recipes',
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        related_name='similar_to',
+        on_delete=models.CASCADE,
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField(
+        verbose_name='Сходство',
+    )
+    rank = models.PositiveSmallIntegerField(
+        verbose_name='Место',
+    )
+
+    class Meta:
+        ordering = ['recipe', 'rank']
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'rank'],
+                                    name='unique_similar_recipe_rank')
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} ~ {self.similar_id}'
+
+
+class ShoppingListItem(models.Model):
+    """Сумма ингредиента по всем рецептам в списке покупок пользователя.
+
+    Поддерживается модулем recipes.shopping_list при изменении списка
+    покупок и ингредиентов рецептов; проверка - команда
+    check_shopping_lists.
+    """
+
+    user = models.ForeignKey(
+        User,
+        related_name='shopping_list',
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        related_name='shopping_list',
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество',
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списке покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.ingredient}: {self.amount}'
+
+
+class SlowQuery(models.Model):
+    """Медленный SQL-запрос, записанный модулем recipes.slow_queries.
+    Хранятся последние SLOW_QUERY_LIMIT записей."""
+
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Время',
+    )
+    database = models.CharField(
+        max_length=100,
+        verbose_name='База',
+    )
+    duration = models.FloatField(
+        verbose_name='Длительность, мс',
+    )
+    fingerprint = models.CharField(
+        max_length=32,
+        db_index=True,
+        verbose_name='Отпечаток',
+    )
+    sql = models.TextField(
+        verbose_name='Запрос',
+    )
+    call_site = models.CharField(
+        max_length=255,
+        verbose_name='Место вызова',
+    )
+    plan = models.TextField(
+        blank=True,
+        verbose_name='План',
+    )
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = 'Медленный запрос'
+        verbose_name_plural = 'Медленные запросы'
+
+    def __str__(self):
+        return f'{self.duration:.0f} мс {self.call_site}'
@@ -0,0 +1,195 @@
+"""Кэш готовых ответов списка и страницы рецептов для анонимов.
+
+Анониму признаки «в избранном», «в списке покупок» и «подписан» всегда
+False, поэтому ответ зависит только от адреса и параметров запроса. Ключ -
+схема, хост (из них строятся ссылки next/previous и адреса картинок), путь
+и отсортированные параметры tags, author, page, limit; запросы с другими
+параметрами не кэшируются.
+
+Запись живёт PAGE_CACHE_TIMEOUT секунд свежей и ещё
+PAGE_CACHE_STALE_TIMEOUT секунд устаревшей. Устаревшую запись пересчитывает
+один запрос, взявший блокировку (cache.add), остальные в это время
+получают устаревшую (stale-while-revalidate). Если записи нет вовсе,
+запросы без блокировки недолго ждут, пока её создаст владелец блокировки.
+
+Изменение рецептов увеличивает версию (invalidate): записи прежних версий
+считаются устаревшими и пересчитываются так же, по одной.
+"""
+import time
+from functools import wraps
+from hashlib import blake2b
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import parse_http_date_safe
+
+PARAMS = ('tags', 'author', 'page', 'limit')
+# 404 тоже кэшируется: иначе поток запросов к удалённому рецепту ждал бы
+# блокировку, не получая записи.
+CACHED_STATUSES = (200, 404)
+HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Vary')
+VERSION_KEY = 'page_cache:version'
+DATA_KEY = 'page_cache:{digest}'
+LOCK_KEY = 'page_cache:{digest}:lock'
+LOCK_TIMEOUT = 10
+WAIT_STEP = 0.05
+WAIT_STEPS = 40
+CONDITIONAL_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
+
+
+class Page:
+    __slots__ = ('version', 'fresh_until', 'status', 'content', 'headers')
+
+    def __init__(self, version, fresh_until, status, content, headers):
+        self.version = version
+        self.fresh_until = fresh_until
+        self.status = status
+        self.content = content
+        self.headers = headers
+
+    def __getstate__(self):
+        return (self.version, self.fresh_until, self.status, self.content,
+                self.headers)
+
+    def __setstate__(self, state):
+        (self.version, self.fresh_until, self.status, self.content,
+         self.headers) = state
+
+
+def normalize(request):
+    """Ключ запроса или None, если запрос с такими параметрами не
+    кэшируется."""
+    params = request.query_params
+    if set(params) - set(PARAMS):
+        return None
+    query = urlencode(sorted(
+        (name, value) for name in params for value in params.getlist(name)
+    ))
+    return (f'{request.accepted_media_type} {request.scheme}://'
+            f'{request.get_host()}{request.path}?{query}')
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(VERSION_KEY, version, None)
+    return version
+
+
+def invalidate():
+    """Делает устаревшими все записи после фиксации транзакции: иначе
+    запрос между увеличением версии и фиксацией сохранил бы прежние
+    данные под новой версией."""
+    if settings.PAGE_CACHE_TIMEOUT:
+        transaction.on_commit(bump_version)
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, None)
+
+
+def get_or_render(key, render):
+    """Запись для ключа key или ответ render(), если он рендерился в этом
+    запросе. Сохраняются ответы CACHED_STATUSES."""
+    digest = blake2b(key.encode(), digest_size=16).hexdigest()
+    data_key = DATA_KEY.format(digest=digest)
+    lock_key = LOCK_KEY.format(digest=digest)
+    version = get_version()
+    page = cache.get(data_key)
+    if (page is not None and page.version == version
+            and page.fresh_until > time.time()):
+        return page
+    locked = cache.add(lock_key, 1, LOCK_TIMEOUT)
+    if not locked:
+        if page is not None:
+            return page
+        for _ in range(WAIT_STEPS):
+            time.sleep(WAIT_STEP)
+            page = cache.get(data_key)
+            if page is not None:
+                return page
+    try:
+        response = render()
+        if response.status_code in CACHED_STATUSES:
+            timeout = settings.PAGE_CACHE_TIMEOUT
+            page = Page(version, time.time() + timeout,
+                        response.status_code, response.content,
+                        tuple((name, response[name]) for name in HEADERS
+                              if response.has_header(name)))
+            cache.set(data_key, page,
+                      timeout + settings.PAGE_CACHE_STALE_TIMEOUT)
+        return response
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+
+def to_response(page):
+    response = HttpResponse(page.content, status=page.status)
+    for name, value in page.headers:
+        response[name] = value
+    return response
+
+
+def cache_anonymous_page(handler):
+    """Декоратор list/retrieve вьюсета: анонимные GET-запросы с
+    кэшируемыми параметрами отдаются из кэша и помечаются
+    Cache-Control: public для микрокэша nginx."""
+
+    @wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        key = None
+        if request.method == 'GET' and not request.user.is_authenticated:
+            key = normalize(request)
+        if key is None:
+            return handler(view, request, *args, **kwargs)
+        if not settings.PAGE_CACHE_TIMEOUT:
+            response = handler(view, request, *args, **kwargs)
+        else:
+            response = cached_response(view, handler, key, request, *args,
+                                       **kwargs)
+        if settings.PAGE_CACHE_MAX_AGE and response.status_code != 304:
+            patch_cache_control(response, public=True,
+                                max_age=settings.PAGE_CACHE_MAX_AGE)
+        return response
+
+    return wrapper
+
+
+def cached_response(view, handler, key, request, *args, **kwargs):
+    def render():
+        # Как APIView.dispatch: 404 и другие исключения тоже становятся
+        # ответом, который можно сохранить.
+        try:
+            response = handler(view, request, *args, **kwargs)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+        response = view.finalize_response(request, response, *args,
+                                          **kwargs)
+        return response.render()
+
+    # Кэшируется полный ответ: условные заголовки клиента проверяются
+    # уже по сохранённым ETag и Last-Modified.
+    conditional = {name: request.META.pop(name)
+                   for name in CONDITIONAL_HEADERS if name in request.META}
+    try:
+        result = get_or_render(key, render)
+    finally:
+        request.META.update(conditional)
+    response = to_response(result) if isinstance(result, Page) else result
+    if response.status_code != 200:
+        return response
+    last_modified = response.get('Last-Modified')
+    return get_conditional_response(
+        request, etag=response.get('ETag'),
+        last_modified=last_modified and parse_http_date_safe(last_modified),
+        response=response,
+    ) or response
@@ -0,0 +1,151 @@
+"""PDF со списком покупок.
+
+Строки списка берутся из итератора (см. shopping_list.iter_shopping_list)
+и переносятся по ширине страницы; ширины символов шрифта считаются один
+раз на процесс и складываются при измерении строк. Готовые страницы
+reportlab хранит сжатыми (pageCompression), а итоговый файл пишется во
+временный файл, который уходит на диск после SPOOL_MAX_SIZE байт, и
+отдаётся потоком.
+"""
+from functools import lru_cache
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from .units import format_amount
+
+FONT = 'ComforterBrush-Regular'
+FONT_FILE = settings.BASE_DIR / 'ComforterBrush-Regular.ttf'
+FONT_SIZE_HEADER = 24
+POSITION_X = 150
+POSITION_Y = 800
+FONT_SIZE = 16
+FROM_BOTTOM = 750
+MIN_BOTTOM = 50
+FROM_LEFT = 50
+LINE_SPACING = 20
+MAX_WIDTH = A4[0] - 2 * FROM_LEFT
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+@lru_cache(maxsize=None)
+def register_font():
+    pdfmetrics.registerFont(TTFont(FONT, FONT_FILE, 'UTF-8'))
+
+
+class CharWidths(dict):
+    """Ширины символов шрифта заданного размера, вычисляются по мере
+    надобности."""
+
+    def __init__(self, font, size):
+        super().__init__()
+        self.font = font
+        self.size = size
+
+    def __missing__(self, char):
+        width = pdfmetrics.stringWidth(char, self.font, self.size)
+        self[char] = width
+        return width
+
+    def measure(self, text):
+        return sum(self[char] for char in text)
+
+
+@lru_cache(maxsize=None)
+def get_widths(font, size):
+    register_font()
+    return CharWidths(font, size)
+
+
+def split_word(word, widths, max_width):
+    """Длина самого длинного начала word не шире max_width (хотя бы один
+    символ)."""
+    total = 0
+    for index, char in enumerate(word):
+        total += widths[char]
+        if total > max_width:
+            return max(index, 1)
+    return len(word)
+
+
+def wrap(text, widths, max_width):
+    """Разбивает text на строки не шире max_width по пробелам; слова
+    длиннее строки разрезаются."""
+    lines = []
+    line = ''
+    line_width = 0
+    space = widths[' ']
+    for word in text.split():
+        word_width = widths.measure(word)
+        if line and line_width + space + word_width <= max_width:
+            line += ' ' + word
+            line_width += space + word_width
+            continue
+        if line:
+            lines.append(line)
+        while word_width > max_width:
+            cut = split_word(word, widths, max_width)
+            lines.append(word[:cut])
+            word = word[cut:]
+            word_width = widths.measure(word)
+        line, line_width = word, word_width
+    if line or not lines:
+        lines.append(line)
+    return lines
+
+
+class ShoppingListRenderer:
+    def __init__(self, output):
+        self.widths = get_widths(FONT, FONT_SIZE)
+        self.canvas = canvas.Canvas(output, pagesize=A4, pageCompression=1)
+        self.canvas.setFont(FONT, FONT_SIZE_HEADER)
+        self.canvas.drawString(POSITION_X, POSITION_Y, 'Список покупок.')
+        self.canvas.setFont(FONT, FONT_SIZE)
+        self.from_bottom = FROM_BOTTOM
+
+    def new_page(self):
+        self.canvas.showPage()
+        self.canvas.setFont(FONT, FONT_SIZE)
+        self.from_bottom = MIN_BOTTOM + FROM_BOTTOM
+
+    def draw_item(self, number, item):
+        prefix = f'{number}. '
+        indent = self.widths.measure(prefix)
+        lines = wrap(
+            f'{item["name"]} - {format_amount(item["amount"])} '
+            f'{item["measurement_unit"]}',
+            self.widths, MAX_WIDTH - indent,
+        )
+        # Пункт не разрывается между страницами, если помещается на одну.
+        height = LINE_SPACING * (len(lines) - 1)
+        if (self.from_bottom - height <= MIN_BOTTOM
+                and height < FROM_BOTTOM):
+            self.new_page()
+        for index, line in enumerate(lines):
+            if self.from_bottom <= MIN_BOTTOM:
+                self.new_page()
+            if index == 0:
+                self.canvas.drawString(FROM_LEFT, self.from_bottom, prefix)
+            self.canvas.drawString(FROM_LEFT + indent, self.from_bottom,
+                                   line)
+            self.from_bottom -= LINE_SPACING
+
+    def render(self, items):
+        for number, item in enumerate(items, start=1):
+            self.draw_item(number, item)
+        self.canvas.showPage()
+        self.canvas.save()
+
+
+def render_shopping_list(items, spool_max_size=SPOOL_MAX_SIZE):
+    """PDF со списком items во временном файле, открытом на начале;
+    возвращает (файл, размер)."""
+    output = SpooledTemporaryFile(max_size=spool_max_size)
+    ShoppingListRenderer(output).render(items)
+    size = output.tell()
+    output.seek(0)
+    return output, size
@@ -1,13 +1,15 @@
 from rest_framework import serializers
 
-from users.serializers import UserSerializer
+from users.serializers import AuthorCardSerializer, UserSerializer
 
 from .fields import Base64ImageField
-from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
-                     ShoppingCart, Tag)
+from .memberships import get_memberships
+from .models import Ingredient, IngredientInRecipe, Recipe, Tag
+from .shopping_list import changing_ingredients
 
 MIN_AMOUNT = 1
 MAX_AMOUNT = 32000
+MAX_BATCH_SIZE = 100
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -33,7 +35,25 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class ShoppingListItemSerializer(serializers.Serializer):
+    """Строка списка покупок из recipes.units.merge."""
+
+    name = serializers.CharField()
+    measurement_unit = serializers.CharField()
+    amount = serializers.ReadOnlyField()
+
+
+class SparseFieldsMixin:
+    """Оставляет в сериализаторе только поля из аргумента fields."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     author = UserSerializer(read_only=True)
     ingredients = IngredientInRecipeSerializer(source='ingredient_to_recipe',
@@ -57,19 +77,29 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
 
     def get_is_favorited(self, recipe):
-        current_user = self.context['request'].user
-        return (
-            self.context['request'].user.is_authenticated
-            and Favorite.objects.filter(recipe=recipe,
-                                        user=current_user).exists()
-        )
+        return recipe.id in get_memberships(self.context['request']).favorites
 
     def get_is_in_shopping_cart(self, recipe):
-        current_user = self.context['request'].user
-        return (
-            self.context['request'].user.is_authenticated
-            and ShoppingCart.objects.filter(recipe=recipe,
-                                            user=current_user).exists()
+        return recipe.id in get_memberships(
+            self.context['request']).shopping_cart
+
+
+class RecipeCardSerializer(RecipeSerializer):
+    """Карточка рецепта в ленте: без текста, ингредиентов и почты автора."""
+
+    author = AuthorCardSerializer(read_only=True)
+    ingredients = None
+
+    class Meta(RecipeSerializer.Meta):
+        fields = (
+            'id',
+            'tags',
+            'author',
+            'is_favorited',
+            'is_in_shopping_cart',
+            'name',
+            'image',
+            'cooking_time',
         )
 
 
@@ -122,14 +152,11 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         )
 
     def get_is_favorited(self, recipe):
-        current_user = self.context['request'].user
-        return Favorite.objects.filter(recipe=recipe,
-                                       user=current_user).exists()
+        return recipe.id in get_memberships(self.context['request']).favorites
 
     def get_is_in_shopping_cart(self, recipe):
-        current_user = self.context['request'].user
-        return ShoppingCart.objects.filter(recipe=recipe,
-                                           user=current_user).exists()
+        return recipe.id in get_memberships(
+            self.context['request']).shopping_cart
 
     def create_ingredients(self, ingredients, recipe):
         bulk_list = list()
@@ -163,8 +190,9 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     def update(self, recipe, validated_data):
         if 'ingredient_to_recipe' in validated_data:
             ingredients = validated_data.pop('ingredient_to_recipe')
-            recipe.ingredients.clear()
-            self.create_ingredients(ingredients, recipe)
+            with changing_ingredients(recipe.id):
+                recipe.ingredients.clear()
+                self.create_ingredients(ingredients, recipe)
         if 'tags' in validated_data:
             tags_data = validated_data.pop('tags')
             recipe.tags.set(tags_data)
@@ -192,3 +220,18 @@ class ShoppingListSerializer(serializers.ModelSerializer):
     def get_ingredient(self, recipe):
         ingredient = recipe.ingredients.all()
         return IngredientSerializer(ingredient, many=True).data
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BATCH_SIZE,
+    )
+
+
+class CollectionExportSerializer(serializers.Serializer):
+    user = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+    )
@@ -0,0 +1,184 @@
+"""Поддержка ShoppingListItem - суммы ингредиентов списка покупок.
+
+Изменения применяются одним запросом INSERT ... ON CONFLICT DO UPDATE
+(прибавить) или UPDATE ... FROM (вычесть) из суммы ингредиентов
+затронутых рецептов, без пересчёта всего списка.
+"""
+from contextlib import contextmanager
+
+from django.db import connections, router, transaction
+from django.db.models import Sum
+
+from . import units
+from .models import IngredientInRecipe, ShoppingCart, ShoppingListItem
+
+
+def get_connection():
+    return connections[router.db_for_write(ShoppingListItem)]
+
+
+def table(model, connection):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def column(model, name, connection):
+    return connection.ops.quote_name(model._meta.get_field(name).column)
+
+
+def user_delta(user_id, recipe_ids, connection):
+    """Сумма ингредиентов рецептов recipe_ids для пользователя user_id."""
+    ingredients = table(IngredientInRecipe, connection)
+    ingredient = column(IngredientInRecipe, 'ingredient', connection)
+    amount = column(IngredientInRecipe, 'amount', connection)
+    recipe = column(IngredientInRecipe, 'recipe', connection)
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    sql = (
+        f'SELECT %s AS user_id, {ingredient} AS ingredient_id, '
+        f'SUM({amount}) AS amount FROM {ingredients} '
+        f'WHERE {recipe} IN ({placeholders}) GROUP BY {ingredient}'
+    )
+    return sql, [user_id, *recipe_ids]
+
+
+def carts_delta(recipe_id, connection):
+    """Ингредиенты рецепта recipe_id для всех, у кого он в списке."""
+    ingredients = table(IngredientInRecipe, connection)
+    carts = table(ShoppingCart, connection)
+    sql = (
+        f'SELECT c.{column(ShoppingCart, "user", connection)} AS user_id, '
+        f'i.{column(IngredientInRecipe, "ingredient", connection)} '
+        f'AS ingredient_id, '
+        f'i.{column(IngredientInRecipe, "amount", connection)} AS amount '
+        f'FROM {carts} c JOIN {ingredients} i '
+        f'ON i.{column(IngredientInRecipe, "recipe", connection)} = '
+        f'c.{column(ShoppingCart, "recipe", connection)} '
+        f'WHERE c.{column(ShoppingCart, "recipe", connection)} = %s'
+    )
+    return sql, [recipe_id]
+
+
+def apply_delta(delta, sign, connection):
+    sql, params = delta
+    items = table(ShoppingListItem, connection)
+    user = column(ShoppingListItem, 'user', connection)
+    ingredient = column(ShoppingListItem, 'ingredient', connection)
+    amount = column(ShoppingListItem, 'amount', connection)
+    with connection.cursor() as cursor:
+        if sign > 0:
+            cursor.execute(
+                f'INSERT INTO {items} ({user}, {ingredient}, {amount}) '
+                f'SELECT user_id, ingredient_id, amount FROM ({sql}) delta '
+                f'WHERE true ON CONFLICT ({user}, {ingredient}) '
+                f'DO UPDATE SET {amount} = {items}.{amount} + '
+                f'excluded.{amount}',
+                params,
+            )
+            return
+        cursor.execute(
+            f'UPDATE {items} SET {amount} = CASE '
+            f'WHEN {items}.{amount} > delta.amount '
+            f'THEN {items}.{amount} - delta.amount ELSE 0 END '
+            f'FROM ({sql}) delta WHERE {items}.{user} = delta.user_id '
+            f'AND {items}.{ingredient} = delta.ingredient_id',
+            params,
+        )
+        cursor.execute(
+            f'DELETE FROM {items} WHERE {amount} = 0 AND {user} IN '
+            f'(SELECT user_id FROM ({sql}) delta)',
+            params,
+        )
+
+
+def add_recipes(user_id, recipe_ids):
+    """Прибавляет ингредиенты рецептов, добавленных в список покупок."""
+    if recipe_ids:
+        connection = get_connection()
+        apply_delta(user_delta(user_id, recipe_ids, connection), 1,
+                    connection)
+
+
+def remove_recipes(user_id, recipe_ids):
+    """Вычитает ингредиенты рецептов, удалённых из списка покупок."""
+    if recipe_ids:
+        connection = get_connection()
+        apply_delta(user_delta(user_id, recipe_ids, connection), -1,
+                    connection)
+
+
+def remove_recipe_from_carts(recipe_id):
+    """Вычитает ингредиенты рецепта у всех, у кого он в списке покупок."""
+    connection = get_connection()
+    apply_delta(carts_delta(recipe_id, connection), -1, connection)
+
+
+@contextmanager
+def changing_ingredients(recipe_id):
+    """Обёртка изменения ингредиентов рецепта: старые ингредиенты
+    вычитаются из списков покупок до изменения, новые прибавляются после.
+    """
+    connection = get_connection()
+    with transaction.atomic(using=connection.alias):
+        apply_delta(carts_delta(recipe_id, connection), -1, connection)
+        yield
+        apply_delta(carts_delta(recipe_id, connection), 1, connection)
+
+
+def get_shopping_list(user_id):
+    """Список покупок пользователя: один запрос к ShoppingListItem и сведение
+    единиц измерения в памяти (см. recipes.units.merge)."""
+    return units.merge(
+        ShoppingListItem.objects.filter(user_id=user_id).values_list(
+            'ingredient__name', 'ingredient__measurement_unit', 'amount')
+    )
+
+
+def iter_shopping_list(user_id, chunk_size=2000):
+    """Список покупок пользователя по порядку названий без загрузки всех
+    строк в память (для выгрузки в файл)."""
+    return units.iter_merge(
+        ShoppingListItem.objects.filter(user_id=user_id).values_list(
+            'ingredient__name', 'ingredient__measurement_unit', 'amount')
+        .order_by('ingredient__name').iterator(chunk_size=chunk_size)
+    )
+
+
+def expected_items(user_ids=None):
+    """Списки покупок, пересчитанные с нуля: {(user_id, ingredient_id):
+    amount}."""
+    carts = ShoppingCart.objects.using(get_connection().alias)
+    if user_ids is not None:
+        carts = carts.filter(user_id__in=user_ids)
+    rows = (
+        carts.values_list('user_id',
+                          'recipe__ingredient_to_recipe__ingredient_id')
+        .annotate(total=Sum('recipe__ingredient_to_recipe__amount'))
+        .order_by()
+    )
+    return {(user_id, ingredient_id): total
+            for user_id, ingredient_id, total in rows
+            if ingredient_id is not None}
+
+
+def rebuild(user_ids=None, batch_size=5000):
+    """Пересчитывает списки покупок пользователей user_ids (всех, если
+    None) с нуля."""
+    connection = get_connection()
+    items = ShoppingListItem.objects.using(connection.alias)
+    with transaction.atomic(using=connection.alias):
+        if user_ids is None:
+            items.all().delete()
+        else:
+            items.filter(user_id__in=user_ids).delete()
+        items.bulk_create(
+            (ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                              amount=amount)
+             for (user_id, ingredient_id), amount
+             in expected_items(user_ids).items()),
+            batch_size=batch_size,
+        )
+
+
+def rebuild_recipes(recipe_ids):
+    """Пересчитывает списки покупок всех, у кого есть рецепты recipe_ids."""
+    rebuild(set(ShoppingCart.objects.filter(recipe_id__in=recipe_ids)
+                .values_list('user_id', flat=True)))
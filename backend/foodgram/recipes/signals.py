@@ -0,0 +1,85 @@
+"""Поддержка Recipe.updated при изменениях, которые не сохраняют рецепт:
+тегов и ингредиентов рецепта, самих тегов и ингредиентов, профиля автора.
+Эти изменения и сохранение и удаление рецептов сбрасывают кэш анонимных
+страниц. Сохранение пользователя учитывается, только если изменились поля
+автора. Удаление рецепта вычитает его ингредиенты из списков покупок.
+
+Избранное, список покупок и подписки сигналов не имеют: их быстрое
+удаление одним запросом работает только без обработчиков.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (m2m_changed, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import page_cache
+from .models import Ingredient, Recipe, Tag
+from .shopping_list import remove_recipe_from_carts
+
+User = get_user_model()
+
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+def touch(recipes):
+    recipes.update(updated=timezone.now())
+    page_cache.invalidate()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_relations_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            touch(Recipe.objects.filter(pk=instance.pk))
+    elif action == 'pre_clear':
+        touch(instance.recipes.all())
+    elif action in ('post_add', 'post_remove'):
+        touch(Recipe.objects.filter(pk__in=pk_set))
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    if not created:
+        touch(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        touch(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(pre_save, sender=User)
+def author_saving(sender, instance, update_fields, using, **kwargs):
+    # Полное сохранение (например, при смене пароля) не должно трогать
+    # рецепты автора, поэтому поля автора сравниваются со значениями в базе.
+    fields = AUTHOR_FIELDS
+    if update_fields is not None:
+        fields = fields & set(update_fields)
+    instance._author_changed = False
+    if instance.pk is None or not fields:
+        return
+    saved = sender._default_manager.using(using).filter(
+        pk=instance.pk).values(*fields).first()
+    instance._author_changed = saved is not None and any(
+        saved[name] != getattr(instance, name) for name in fields)
+
+
+@receiver(post_save, sender=User)
+def author_saved(sender, instance, created, **kwargs):
+    if not created and instance.__dict__.pop('_author_changed', False):
+        touch(Recipe.objects.filter(author=instance))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, **kwargs):
+    page_cache.invalidate()
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    remove_recipe_from_carts(instance.pk)
+    page_cache.invalidate()
@@ -0,0 +1,197 @@
+"""Построение таблицы похожих рецептов (SimilarRecipe).
+
+Сходство по избранному - косинус между строками разреженной матрицы
+«рецепт x пользователь»: число пользователей, добавивших в избранное оба
+рецепта, делённое на корень из произведения их популярностей. Рецептам,
+у которых так набирается меньше ``neighbors`` соседей, список дополняется
+рецептами с похожими ингредиентами (косинус векторов ингредиентов с весами
+idf, чтобы соль и сахар не делали похожими все рецепты).
+
+Произведения матриц считаются блоками по ``block_size`` рецептов, лучшие
+соседи каждой строки выбираются сортировкой всего блока (np.lexsort), без
+циклов по рецептам: память ограничена размером блока, а не квадратом
+числа рецептов.
+
+Рецепты, избранное и ингредиенты читаются в одной транзакции
+REPEATABLE READ: изменения во время пересчёта не рассогласуют матрицы.
+"""
+from contextlib import contextmanager
+
+import numpy as np
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from scipy import sparse
+
+from .models import Favorite, IngredientInRecipe, Recipe, SimilarRecipe
+
+NEIGHBORS = 10
+BLOCK_SIZE = 2000
+INSERT_BATCH_SIZE = 5000
+
+
+@contextmanager
+def snapshot(using=DEFAULT_DB_ALIAS):
+    """Транзакция, все чтения в которой видят одно состояние базы."""
+    connection = connections[using]
+    # Уровень изоляции задаётся первой командой транзакции; вложенная
+    # транзакция остаётся на уровне внешней.
+    nested = connection.in_atomic_block
+    with transaction.atomic(using=using):
+        if connection.vendor == 'postgresql' and not nested:
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL '
+                               'REPEATABLE READ READ ONLY')
+        yield
+
+
+def load_pairs(queryset, fields):
+    """Две колонки queryset как массивы int64 без списков кортежей."""
+    rows = queryset.values_list(*fields).order_by().iterator(
+        chunk_size=INSERT_BATCH_SIZE)
+    flat = np.fromiter((value for row in rows for value in row),
+                       dtype=np.int64)
+    return flat[0::2], flat[1::2]
+
+
+def known(recipe_ids, recipes, *columns):
+    """Оставляет пары только с рецептами из recipe_ids и заменяет id
+    рецептов номерами строк."""
+    keep = np.isin(recipes, recipe_ids)
+    return (np.searchsorted(recipe_ids, recipes[keep]),
+            *(column[keep] for column in columns))
+
+
+def favorites_matrix(recipe_ids):
+    """Матрица «рецепт x пользователь» (CSR) и нормы её строк."""
+    user_ids, favorite_recipes = load_pairs(Favorite.objects,
+                                            ('user_id', 'recipe_id'))
+    rows, user_ids = known(recipe_ids, favorite_recipes, user_ids)
+    _, users = np.unique(user_ids, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(users), dtype=np.float32), (rows, users)),
+        shape=(len(recipe_ids), users.max() + 1 if len(users) else 0),
+    )
+    return matrix, np.sqrt(np.asarray(matrix.sum(axis=1)).ravel())
+
+
+def ingredients_matrix(recipe_ids):
+    """Матрица «рецепт x ингредиент» с весами idf и единичными строками."""
+    item_recipes, ingredient_ids = load_pairs(
+        IngredientInRecipe.objects, ('recipe_id', 'ingredient_id'))
+    rows, ingredient_ids = known(recipe_ids, item_recipes, ingredient_ids)
+    _, ingredients = np.unique(ingredient_ids, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(ingredients), dtype=np.float32), (rows, ingredients)),
+        shape=(len(recipe_ids),
+               ingredients.max() + 1 if len(ingredients) else 0),
+    )
+    matrix.data[:] = 1
+    document_frequency = np.bincount(matrix.indices,
+                                     minlength=matrix.shape[1])
+    idf = np.log(len(recipe_ids) / np.maximum(document_frequency, 1))
+    matrix = matrix @ sparse.diags(idf.astype(np.float32))
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
+
+
+def top_k(rows, columns, scores, neighbors):
+    """Оставляет в каждой строке neighbors пар с наибольшим score.
+
+    Возвращает (rows, columns, scores, ranks), ranks с нуля.
+    """
+    order = np.lexsort((-scores, rows))
+    rows, columns, scores = rows[order], columns[order], scores[order]
+    starts = np.searchsorted(rows, rows)
+    ranks = np.arange(len(rows)) - starts
+    keep = ranks < neighbors
+    return rows[keep], columns[keep], scores[keep], ranks[keep]
+
+
+def block_neighbors(products, row_index, neighbors):
+    """Лучшие соседи строк блока по произведению матриц, без самих
+    рецептов; row_index - номера рецептов строк блока."""
+    products = products.tocoo()
+    rows = row_index[products.row]
+    keep = (products.col != rows) & (products.data > 0)
+    return top_k(rows[keep], products.col[keep].astype(np.int64),
+                 products.data[keep], neighbors)
+
+
+def merge(favorite, fallback, neighbors):
+    """Соседи по избранному, затем по ингредиентам, без повторов."""
+    rows = np.concatenate([favorite[0], fallback[0]])
+    columns = np.concatenate([favorite[1], fallback[1]])
+    scores = np.concatenate([favorite[2], fallback[2]])
+    priority = np.concatenate([np.zeros(len(favorite[0]), dtype=np.int8),
+                               np.ones(len(fallback[0]), dtype=np.int8)])
+    order = np.lexsort((-scores, priority, columns, rows))
+    rows, columns = rows[order], columns[order]
+    scores, priority = scores[order], priority[order]
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = (rows[1:] != rows[:-1]) | (columns[1:] != columns[:-1])
+    rows, columns = rows[first], columns[first]
+    scores, priority = scores[first], priority[first]
+    order = np.lexsort((-scores, priority, rows))
+    rows, columns, scores = rows[order], columns[order], scores[order]
+    ranks = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    keep = ranks < neighbors
+    return rows[keep], columns[keep], scores[keep], ranks[keep]
+
+
+def compute(neighbors=NEIGHBORS, block_size=BLOCK_SIZE):
+    """Соседи всех рецептов: (recipe_ids, similar_ids, scores, ranks)."""
+    with snapshot():
+        recipe_ids = np.sort(np.fromiter(
+            Recipe.objects.values_list('id', flat=True).iterator(),
+            dtype=np.int64))
+        favorites, norms = favorites_matrix(recipe_ids)
+        ingredients = ingredients_matrix(recipe_ids)
+    favorites_t = favorites.T.tocsr()
+    ingredients_t = ingredients.T.tocsr()
+    inverse_norms = np.divide(1, norms, out=np.zeros_like(norms),
+                              where=norms > 0)
+    result = []
+    for start in range(0, len(recipe_ids), block_size):
+        stop = min(start + block_size, len(recipe_ids))
+        co_favorites = favorites[start:stop] @ favorites_t
+        cosine = (sparse.diags(inverse_norms[start:stop])
+                  @ co_favorites @ sparse.diags(inverse_norms))
+        favorite = block_neighbors(cosine, np.arange(start, stop),
+                                   neighbors)
+        counts = np.bincount(favorite[0] - start, minlength=stop - start)
+        needy = start + np.flatnonzero(counts < neighbors)
+        fallback = block_neighbors(ingredients[needy] @ ingredients_t,
+                                   needy, neighbors)
+        result.append(merge(favorite, fallback, neighbors))
+    if not result:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0), empty
+    rows, columns, scores, ranks = (np.concatenate(parts)
+                                    for parts in zip(*result))
+    return recipe_ids[rows], recipe_ids[columns], scores, ranks
+
+
+def rebuild(neighbors=NEIGHBORS, block_size=BLOCK_SIZE):
+    """Пересчитывает SimilarRecipe и возвращает число строк."""
+    recipes, similar, scores, ranks = compute(neighbors, block_size)
+    with transaction.atomic():
+        # Рецепты, удалённые во время пересчёта.
+        existing = np.fromiter(
+            Recipe.objects.values_list('id', flat=True).iterator(),
+            dtype=np.int64)
+        keep = np.isin(recipes, existing) & np.isin(similar, existing)
+        recipes, similar = recipes[keep], similar[keep]
+        scores, ranks = scores[keep], ranks[keep]
+        SimilarRecipe.objects.all().delete()
+        for start in range(0, len(recipes), INSERT_BATCH_SIZE):
+            stop = start + INSERT_BATCH_SIZE
+            SimilarRecipe.objects.bulk_create(
+                SimilarRecipe(recipe_id=recipe, similar_id=similar_id,
+                              score=score, rank=rank + 1)
+                for recipe, similar_id, score, rank in zip(
+                    recipes[start:stop].tolist(),
+                    similar[start:stop].tolist(),
+                    scores[start:stop].tolist(),
+                    ranks[start:stop].tolist())
+            )
+    return len(recipes)
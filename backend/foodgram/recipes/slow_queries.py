@@ -0,0 +1,138 @@
+"""Запись медленных SQL-запросов (SLOW_QUERY_MS > 0).
+
+Каждое новое соединение с базой получает execute_wrapper, который
+замеряет запросы. Запрос дольше SLOW_QUERY_MS миллисекунд сохраняется в
+SlowQuery с отпечатком (SQL без значений: одинаковые запросы с разными
+параметрами и длиной списков IN получают один отпечаток) и местом вызова -
+ближайшим кадром стека в коде проекта. Для первого SELECT с отпечатком,
+у которого ещё нет плана, на PostgreSQL выполняется
+EXPLAIN (ANALYZE, BUFFERS) с теми же параметрами, на других базах - EXPLAIN
+без выполнения. EXPLAIN ANALYZE выполняет запрос ещё раз прямо в запросе
+пользователя, поэтому первый медленный запрос с новым отпечатком отвечает
+примерно вдвое дольше; следующие с тем же отпечатком план не снимают.
+
+Записи пишутся через отдельное соединение с основной базой
+(SLOW_QUERY_DATABASE): они не входят в транзакцию запроса и сохраняются,
+даже если она откатится. На SQLite запись ждёт, пока пишущая транзакция
+запроса не завершится, и после таймаута пропускается. Хранятся последние
+SLOW_QUERY_LIMIT записей.
+"""
+import logging
+import re
+import sys
+import threading
+import time
+from hashlib import blake2b
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .models import SlowQuery
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = str(settings.BASE_DIR)
+SKIPPED_DIRS = ('site-packages', 'dist-packages')
+SQL_LENGTH = 10000
+
+re_in_list = re.compile(r'\bIN \((?:%s, )*%s\)', re.IGNORECASE)
+re_string = re.compile(r"'(?:[^']|'')*'")
+re_number = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+re_space = re.compile(r'\s+')
+
+_local = threading.local()
+
+
+def fingerprint(sql):
+    """SQL без значений и его хэш."""
+    normalized = re_in_list.sub('IN (...)', sql)
+    normalized = re_string.sub('?', normalized)
+    normalized = re_number.sub('?', normalized)
+    normalized = re_space.sub(' ', normalized).strip()
+    return normalized, blake2b(normalized.encode(),
+                               digest_size=16).hexdigest()
+
+
+def get_call_site():
+    """Ближайший кадр стека в коде проекта, кроме этого модуля."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(PROJECT_DIR) and filename != __file__
+                and not any(name in filename for name in SKIPPED_DIRS)):
+            path = Path(filename).relative_to(PROJECT_DIR)
+            return f'{path}:{frame.f_lineno} {frame.f_code.co_name}'
+        frame = frame.f_back
+    return '-'
+
+
+def explain(connection, sql, params):
+    if not connection.features.supports_explaining_query_execution:
+        return ''
+    options = {}
+    if connection.vendor == 'postgresql':
+        options = {'analyze': True, 'buffers': True}
+    prefix = connection.ops.explain_query_prefix(**options)
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}', params)
+        return '\n'.join(
+            ' '.join(map(str, row)) for row in cursor.fetchall())
+
+
+def sample_plan(connection, sql, params):
+    # Точка сохранения: ошибка EXPLAIN не прерывает транзакцию запроса.
+    try:
+        with transaction.atomic(using=connection.alias):
+            return explain(connection, sql, params)
+    except DatabaseError:
+        logger.warning('Не удалось получить план запроса', exc_info=True)
+        return ''
+
+
+def record(connection, sql, params, many, duration):
+    normalized, digest = fingerprint(sql)
+    queries = SlowQuery.objects.using(settings.SLOW_QUERY_DATABASE)
+    plan = ''
+    if (not many and sql.lstrip()[:6].upper() == 'SELECT'
+            and not queries.filter(fingerprint=digest)
+            .exclude(plan='').exists()):
+        plan = sample_plan(connection, sql, params)
+    with transaction.atomic(using=settings.SLOW_QUERY_DATABASE):
+        query = queries.create(
+            database=connection.alias,
+            duration=duration,
+            fingerprint=digest,
+            sql=normalized[:SQL_LENGTH],
+            call_site=get_call_site()[:255],
+            plan=plan,
+        )
+        queries.filter(id__lte=query.id - settings.SLOW_QUERY_LIMIT).delete()
+
+
+def capture(execute, sql, params, many, context):
+    if getattr(_local, 'recording', False):
+        return execute(sql, params, many, context)
+    started = time.monotonic()
+    result = execute(sql, params, many, context)
+    duration = (time.monotonic() - started) * 1000
+    if duration >= settings.SLOW_QUERY_MS:
+        _local.recording = True
+        try:
+            record(context['connection'], sql, params, many, duration)
+        except DatabaseError:
+            logger.warning('Не удалось записать медленный запрос',
+                           exc_info=True)
+        finally:
+            _local.recording = False
+    return result
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    # Обёртки хранятся в объекте соединения Django и переживают
+    # переподключения, поэтому добавляются один раз.
+    if settings.SLOW_QUERY_MS and capture not in connection.execute_wrappers:
+        connection.execute_wrappers.append(capture)
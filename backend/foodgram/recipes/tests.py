@@ -0,0 +1,338 @@
+import io
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APITestCase
+
+from users.follows import follow
+from users.serializers import SubscriptionsSerializer
+from users.views import ListSubscriptions
+
+from . import shopping_list, similarity
+from .collection import CollectionError, Importer, export_lines
+from .fast_serializers import FAST_SERIALIZERS, FastSerializer
+from .management.commands.importtime import WORKER_IMPORTS
+from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                     ShoppingCart, SlowQuery, Tag, TrendingRecipe)
+from .serializers import (FavoriteSerializer, RecipeCardSerializer,
+                          RecipeSerializer)
+
+User = get_user_model()
+
+
+class RecipeFixtureMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Иван', last_name='Петров', password='password-123')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Суп', image='recipes/images/soup.png',
+            text='Сварить.', cooking_time=10)
+
+
+class RecipeDetailTests(RecipeFixtureMixin, APITestCase):
+    def test_retrieve(self):
+        response = self.client.get(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], 'Суп')
+
+    def test_retrieve_non_numeric_pk(self):
+        response = self.client.get('/api/recipes/abc/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_retrieve_missing(self):
+        response = self.client.get(f'/api/recipes/{self.recipe.pk + 1}/')
+        self.assertEqual(response.status_code, 404)
+
+
+class SimilarRecipesTests(RecipeFixtureMixin, APITestCase):
+    def test_similar(self):
+        other = Recipe.objects.create(
+            author=self.author, name='Борщ', image='recipes/images/borsch.png',
+            text='Сварить.', cooking_time=60)
+        Favorite.objects.create(user=self.author, recipe=self.recipe)
+        Favorite.objects.create(user=self.author, recipe=other)
+        similarity.rebuild()
+        response = self.client.get(f'/api/recipes/{other.pk}/similar/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([recipe['id'] for recipe in response.json()],
+                         [self.recipe.pk])
+
+    def test_similar_without_neighbors(self):
+        response = self.client.get(f'/api/recipes/{self.recipe.pk}/similar/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+    def test_similar_non_numeric_pk(self):
+        response = self.client.get('/api/recipes/abc/similar/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_similar_missing(self):
+        response = self.client.get(
+            f'/api/recipes/{self.recipe.pk + 1}/similar/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_rows_outside_snapshot_are_ignored(self):
+        # Рецепт, созданный после чтения списка рецептов.
+        other = Recipe.objects.create(
+            author=self.author, name='Борщ', image='recipes/images/borsch.png',
+            text='Сварить.', cooking_time=60)
+        Favorite.objects.create(user=self.author, recipe=other)
+        matrix, norms = similarity.favorites_matrix(
+            np.array([self.recipe.pk], dtype=np.int64))
+        self.assertEqual(matrix.shape[0], 1)
+        self.assertEqual(norms.tolist(), [0])
+
+
+def create_recipes(number, count, ingredients=1):
+    """count рецептов нового автора с тегом и ingredients ингредиентами,
+    каждый в избранном и списке покупок автора."""
+    author = User.objects.create_user(
+        username=f'author{number}', email=f'author{number}@example.com',
+        first_name='Иван', last_name='Петров', password='password-123')
+    tag = Tag.objects.create(name=f'Тег {number}', color=f'#0000{number:02}',
+                             slug=f'tag{number}')
+    items = [
+        Ingredient.objects.create(name=f'Ингредиент {number}-{index}',
+                                  measurement_unit='г')
+        for index in range(ingredients)
+    ]
+    for index in range(count):
+        recipe = Recipe.objects.create(
+            author=author, name=f'Рецепт {number}-{index}',
+            image='recipes/images/recipe.png', text='Сварить.',
+            cooking_time=10)
+        recipe.tags.add(tag)
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(recipe=recipe, ingredient=item, amount=100)
+            for item in items)
+        Favorite.objects.create(user=author, recipe=recipe)
+        ShoppingCart.objects.create(user=author, recipe=recipe)
+        TrendingRecipe.objects.create(recipe=recipe, score=1,
+                                      rank=recipe.pk)
+        SlowQuery.objects.create(database='default', duration=100,
+                                 fingerprint=f'{number}-{index}',
+                                 sql='SELECT 1', call_site='-')
+    shopping_list.rebuild([author.id])
+    return recipe
+
+
+class AdminQueryTests(TestCase):
+    """Число запросов страниц админки не зависит от числа строк."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', first_name='Админ',
+            last_name='Админов', password='password-123')
+        create_recipes(1, 1)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def get_urls(self, name, *args):
+        return {
+            model: reverse(f'admin:{model._meta.app_label}_'
+                           f'{model._meta.model_name}_{name}', args=args)
+            for model in admin.site._registry
+            if model._meta.app_label == 'recipes'
+        }
+
+    def count_queries(self, url):
+        # Первый запрос заполняет кэш ContentType.
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries)
+
+    def test_changelists(self):
+        urls = self.get_urls('changelist')
+        counts = {model: self.count_queries(url)
+                  for model, url in urls.items()}
+        create_recipes(2, 20)
+        for model, url in urls.items():
+            with self.subTest(model=model.__name__):
+                with self.assertNumQueries(counts[model]):
+                    self.client.get(url)
+
+    def test_recipe_change_form(self):
+        url = reverse('admin:recipes_recipe_change',
+                      args=(Recipe.objects.get().pk,))
+        expected = self.count_queries(url)
+        recipe = create_recipes(2, 1, ingredients=10)
+        with self.assertNumQueries(expected):
+            response = self.client.get(reverse('admin:recipes_recipe_change',
+                                               args=(recipe.pk,)))
+        self.assertContains(response, 'Ингредиент 2-9, г')
+
+
+class StartupImportTests(SimpleTestCase):
+    """Тяжёлые пакеты не загружаются при старте воркера."""
+
+    FORBIDDEN = ('reportlab', 'numpy', 'scipy')
+
+    def test_worker_imports(self):
+        code = WORKER_IMPORTS + 'import sys\nprint(" ".join(sys.modules))\n'
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+        result = subprocess.run(
+            [sys.executable, '-c', code], env=env, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        packages = {name.split('.')[0] for name in result.stdout.split()}
+        self.assertEqual(packages & set(self.FORBIDDEN), set())
+
+
+class CollectionTests(RecipeFixtureMixin, TestCase):
+    def export(self):
+        return b''.join(export_lines()).splitlines()
+
+    def test_export_without_passwords(self):
+        self.assertNotIn(b'password', b'\n'.join(self.export()))
+
+    def test_import_unusable_password(self):
+        lines = self.export()
+        User.objects.all().delete()
+        Importer().load(lines)
+        author = User.objects.get(username=self.author.username)
+        self.assertFalse(author.has_usable_password())
+        self.assertTrue(author.recipes.filter(name='Суп').exists())
+
+    def test_import_is_atomic(self):
+        lines = self.export()
+        User.objects.all().delete()
+        # Ошибка после того, как первые порции уже вставлены.
+        with self.assertRaises(CollectionError):
+            Importer(batch_size=1).load(lines + [b'{"type": "unknown"}'])
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(Recipe.objects.exists())
+
+
+class WarmCachesTests(RecipeFixtureMixin, TestCase):
+    """warm_caches прогревает только общий кэш и только с WARM_URL."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.shared = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': directory.name,
+        }}
+
+    @override_settings(WARM_URL='http://testserver')
+    def test_per_process_cache(self):
+        with self.assertRaisesMessage(CommandError, 'LocMemCache'):
+            call_command('warm_caches', stdout=io.StringIO())
+
+    @override_settings(WARM_URL='')
+    def test_no_warm_url(self):
+        with override_settings(CACHES=self.shared):
+            with self.assertRaisesMessage(CommandError, 'WARM_URL'):
+                call_command('warm_caches', stdout=io.StringIO())
+
+    @override_settings(WARM_URL='http://testserver', PAGE_CACHE_TIMEOUT=60)
+    def test_shared_cache(self):
+        with override_settings(CACHES=self.shared):
+            call_command('warm_caches', pages=1,
+                         stdout=io.StringIO())
+            with self.assertNumQueries(0):
+                response = self.client.get('/api/recipes/', {'page': 1})
+            self.assertContains(response, self.recipe.name)
+
+
+class FastSerializerTests(TestCase):
+    """Быстрые сериализаторы выводят те же байты, что и DRF."""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_recipes(1, 3, ingredients=2)
+        create_recipes(2, 4, ingredients=3)
+        cls.reader = User.objects.get(username='author1')
+        follow(cls.reader, User.objects.get(username='author2').id)
+        Favorite.objects.create(user=cls.reader,
+                                recipe=Recipe.objects.order_by('id').last())
+
+    def get_request(self, user=None):
+        request = Request(RequestFactory().get('/api/recipes/'))
+        if user is not None:
+            request.user = user
+        return request
+
+    def assert_same_output(self, serializer_class, instance, request,
+                           many=True, **kwargs):
+        context = {'request': request}
+        renderer = JSONRenderer()
+        expected = renderer.render(serializer_class(
+            instance, many=many, context=context, **kwargs).data)
+        actual = renderer.render(FAST_SERIALIZERS[serializer_class](
+            instance, many=many, context=context, **kwargs).data)
+        self.assertEqual(actual, expected)
+
+    def test_recipes(self):
+        prefetched = Recipe.objects.select_related('author').prefetch_related(
+            'tags', 'ingredient_to_recipe__ingredient')
+        for user in (None, self.reader):
+            for recipes in (Recipe.objects.all(), prefetched):
+                for serializer_class in (RecipeSerializer,
+                                         RecipeCardSerializer):
+                    fields = serializer_class.Meta.fields
+                    for selected in (None, fields[:1], fields[::2]):
+                        with self.subTest(user=user,
+                                          serializer=serializer_class,
+                                          fields=selected):
+                            self.assert_same_output(
+                                serializer_class, list(recipes),
+                                self.get_request(user), fields=selected)
+
+    def test_favorite(self):
+        recipe = Recipe.objects.first()
+        for request in (self.get_request(), None):
+            with self.subTest(request=request):
+                self.assert_same_output(FavoriteSerializer, recipe,
+                                        request, many=False)
+
+    def test_subscriptions(self):
+        request = self.get_request(self.reader)
+        for authors in (User.objects.all(),
+                        ListSubscriptions(request=request).get_queryset()):
+            with self.subTest(authors=authors.query):
+                self.assert_same_output(SubscriptionsSerializer,
+                                        list(authors), request)
+
+    def test_incomplete_subclass(self):
+        with self.assertRaisesMessage(TypeError, 'get_accessors'):
+            type('Serializer', (FastSerializer,),
+                 {'Meta': FavoriteSerializer.Meta})
+        with self.assertRaisesMessage(TypeError, 'Meta.fields'):
+            type('Serializer', (FastSerializer,),
+                 {'get_accessors': lambda self: {}})
+
+    def test_endpoints(self):
+        token = Token.objects.create(user=self.reader)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+        recipe = Recipe.objects.first()
+        for url in ('/api/recipes/', f'/api/recipes/{recipe.id}/',
+                    '/api/recipes/?omit=tags', '/api/users/subscriptions/'):
+            with self.subTest(url=url):
+                with override_settings(FAST_SERIALIZERS=False):
+                    expected = self.client.get(url)
+                with override_settings(FAST_SERIALIZERS=True):
+                    actual = self.client.get(url)
+                self.assertEqual(actual.status_code, 200)
+                self.assertEqual(actual.content, expected.content)
@@ -0,0 +1,89 @@
+"""Рейтинг популярных рецептов.
+
+Популярность рецепта - сумма добавлений в избранное и в списки покупок за
+последние TRENDING_WINDOW_DAYS дней, каждое с весом, убывающим вдвое за
+TRENDING_HALF_LIFE_HOURS часов. Время округляется до интервалов по
+TRENDING_BUCKET_HOURS часов, поэтому вес - это CASE по интервалам, и весь
+пересчёт - один запрос INSERT ... SELECT с агрегатами и ROW_NUMBER() без
+обхода строк в Python.
+
+Упорядоченный список id рецептов хранится в TrendingRecipe и в кэше.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import Case, FloatField, Sum, Value, When
+from django.utils import timezone
+
+from .models import Favorite, ShoppingCart, TrendingRecipe
+
+CACHE_KEY = 'trending:ids'
+
+
+def bucket_weight(bucket):
+    """Вес добавления из интервала bucket (0 - последний) по середине
+    интервала."""
+    age = (bucket + 0.5) * settings.TRENDING_BUCKET_HOURS
+    return 0.5 ** (age / settings.TRENDING_HALF_LIFE_HOURS)
+
+
+def decayed_counts(model, weight, now):
+    """Запрос (recipe_id, score) по добавлениям model за окно."""
+    step = timedelta(hours=settings.TRENDING_BUCKET_HOURS)
+    window = timedelta(days=settings.TRENDING_WINDOW_DAYS)
+    decay = Case(
+        *(When(created__gte=now - step * (bucket + 1),
+               then=Value(weight * bucket_weight(bucket)))
+          for bucket in range(int(window / step))),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    return (
+        model.objects.filter(created__gte=now - window).order_by()
+        .values('recipe_id').annotate(score=Sum(decay))
+    )
+
+
+def refresh():
+    """Пересчитывает рейтинг и возвращает число рецептов в нём."""
+    connection = connections[router.db_for_write(TrendingRecipe)]
+    quote = connection.ops.quote_name
+    now = timezone.now()
+    favorites, favorite_params = decayed_counts(
+        Favorite, 1.0, now).query.sql_with_params()
+    carts, cart_params = decayed_counts(
+        ShoppingCart, settings.TRENDING_CART_WEIGHT,
+        now).query.sql_with_params()
+    table = quote(TrendingRecipe._meta.db_table)
+    recipe = quote(TrendingRecipe._meta.get_field('recipe').column)
+    score = quote(TrendingRecipe._meta.get_field('score').column)
+    rank = quote(TrendingRecipe._meta.get_field('rank').column)
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.execute(
+                f'INSERT INTO {table} ({recipe}, {score}, {rank}) '
+                f'SELECT recipe_id, score, ROW_NUMBER() OVER '
+                f'(ORDER BY score DESC, recipe_id DESC) FROM ('
+                f'SELECT recipe_id, SUM(score) AS score FROM '
+                f'({favorites} UNION ALL {carts}) scores '
+                f'GROUP BY recipe_id ORDER BY score DESC, recipe_id DESC '
+                f'LIMIT %s) top',
+                [*favorite_params, *cart_params, settings.TRENDING_SIZE],
+            )
+            count = cursor.rowcount
+        transaction.on_commit(lambda: cache.delete(CACHE_KEY),
+                              using=connection.alias)
+    return count
+
+
+def get_ranked_ids():
+    """id рецептов по убыванию популярности."""
+    ids = cache.get(CACHE_KEY)
+    if ids is None:
+        ids = list(TrendingRecipe.objects.order_by('rank')
+                   .values_list('recipe_id', flat=True))
+        cache.set(CACHE_KEY, ids, settings.TRENDING_CACHE_TIMEOUT)
+    return ids
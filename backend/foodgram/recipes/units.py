@@ -0,0 +1,94 @@
+"""Единицы измерения списка покупок.
+
+Ингредиенты с одним названием, но разными единицами (г и кг, ст. л. и
+мл) суммируются в базовой единице своей величины: массы - в граммах,
+объёма - в миллилитрах. Единицы без пересчёта (шт., по вкусу, пучок)
+остаются как есть и суммируются только между собой.
+"""
+from itertools import groupby
+from operator import itemgetter
+
+# Единица -> (базовая единица, множитель).
+UNIT_CONVERSIONS = {
+    'мг': ('г', 0.001),
+    'г': ('г', 1),
+    'кг': ('г', 1000),
+    'мл': ('мл', 1),
+    'л': ('мл', 1000),
+    'капля': ('мл', 0.05),
+    'ч. л.': ('мл', 5),
+    'ст. л.': ('мл', 15),
+    'стакан': ('мл', 250),
+}
+
+# Базовая единица -> (порог, крупная единица) для вывода.
+LARGER_UNITS = {
+    'г': (1000, 'кг'),
+    'мл': (1000, 'л'),
+}
+
+PRECISION = 2
+
+
+def normalize(unit):
+    return ' '.join(unit.split())
+
+
+def to_base(unit):
+    """(базовая единица, множитель) для единицы unit."""
+    return UNIT_CONVERSIONS.get(unit, (unit, 1))
+
+
+def humanize(amount, unit):
+    """Переводит количество в крупную единицу, если оно не меньше порога:
+    1500 г -> 1.5 кг. Целые значения возвращаются как int."""
+    threshold, larger = LARGER_UNITS.get(unit, (None, None))
+    if threshold is not None and amount >= threshold:
+        amount, unit = amount / threshold, larger
+    amount = round(amount, PRECISION)
+    if amount == int(amount):
+        amount = int(amount)
+    return amount, unit
+
+
+def format_amount(amount):
+    return str(amount).replace('.', ',')
+
+
+def merge(rows):
+    """Суммирует строки (название, единица, количество) по названию и
+    величине за один проход.
+
+    Если все строки группы в одной единице, она и остаётся (2 ст. л. не
+    превращаются в 30 мл); иначе сумма выводится в базовой единице.
+    Возвращает словари name, measurement_unit, amount, отсортированные по
+    названию.
+    """
+    groups = {}
+    for name, unit, amount in rows:
+        unit = normalize(unit)
+        base, factor = to_base(unit)
+        group = groups.get((name, base))
+        if group is None:
+            groups[(name, base)] = [amount * factor, unit, amount]
+            continue
+        group[0] += amount * factor
+        group[2] += amount
+        if group[1] != unit:
+            group[1] = None
+    items = []
+    for (name, base), (total, unit, amount) in sorted(groups.items()):
+        if unit is None:
+            amount, unit = humanize(total, base)
+        else:
+            amount, unit = humanize(amount, unit)
+        items.append({'name': name, 'measurement_unit': unit,
+                      'amount': amount})
+    return items
+
+
+def iter_merge(rows):
+    """Как merge, но лениво: rows должны идти по порядку названий, и в
+    памяти держится только одна группа."""
+    for _, group in groupby(rows, key=itemgetter(0)):
+        yield from merge(group)
@@ -1,8 +1,9 @@
 from django.urls import include, path
 from rest_framework.routers import SimpleRouter
 
-from .views import (FavoriteView, IngredientsViewSet, RecipeViewSet,
-                    ShoppingCardView, TagViewSet)
+from .views import (CollectionExportView, CollectionImportView, FavoriteView,
+                    IngredientsViewSet, RecipeViewSet, ShoppingCardView,
+                    ShoppingCartBatchView, ShoppingListView, TagViewSet)
 
 router = SimpleRouter()
 
@@ -18,10 +19,24 @@ urlpatterns = [
         ShoppingCardView.as_view(),
         name='download_shopping_cart',
     ),
+    path(
+        'recipes/shopping_cart/',
+        ShoppingCartBatchView.as_view(),
+        name='shopping_cart_batch',
+    ),
+    path(
+        'recipes/shopping_list/',
+        ShoppingListView.as_view(),
+        name='shopping_list',
+    ),
     path(
         'recipes/<int:recipe_id>/shopping_cart/',
         ShoppingCardView.as_view(),
         name='shopping_cart',
     ),
+    path('collection/export/', CollectionExportView.as_view(),
+         name='collection_export'),
+    path('collection/import/', CollectionImportView.as_view(),
+         name='collection_import'),
     path('', include(router.urls)),
 ]
@@ -1,42 +1,135 @@
+from django.db import connections, router, transaction
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.response import Response
 
-from .models import Recipe
+from . import shopping_list
+from .fast_serializers import fast
+from .memberships import update_memberships
+from .models import Recipe, ShoppingCart
 from .serializers import FavoriteSerializer
 
+DELETE_ERROR = ('Ошибка удаления из избранного/списка покупок'
+                ' (Например, когда рецепта там не было')
+POST_ERROR = ('Ошибка добавления в избранное/список покупок '
+              '(Например, когда рецепт уже есть в '
+              'избранном/списке покупок)')
 
-def delete(request, recipe_id, model):
-    user = request.user
-    recipe = get_object_or_404(Recipe, id=recipe_id)
-    if not model.objects.filter(user=user, recipe=recipe).exists():
-        return Response(
-            {
-                'errors': 'Ошибка удаления из избранного/списка покупок'
-                ' (Например, когда рецепта там не было'
-            },
-            status=status.HTTP_400_BAD_REQUEST,
-        )
-    obj = get_object_or_404(model, user=user, recipe=recipe)
-    obj.delete()
-    return Response(
-        {'errors': 'Рецепт успешно удален из ' 'избранного/списка покупок'},
-        status=status.HTTP_204_NO_CONTENT,
+
+def insert_ignore_conflicts(model, user, target_field, target_ids,
+                            exclude_id=None):
+    """Одним запросом INSERT ... SELECT связывает пользователя с
+    существующими объектами target_ids, пропуская уже существующие связи.
+
+    Поля auto_now_add заполняются текущим временем. Возвращает список id
+    действительно добавленных объектов (RETURNING): гонка двух одинаковых
+    запросов заканчивается одной вставкой без ошибки целостности.
+    """
+    target = model._meta.get_field(target_field)
+    target_meta = target.related_model._meta
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    target_pk = quote(target_meta.pk.column)
+    stamps = [field for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now_add', False)]
+    now = timezone.now()
+    columns = ', '.join(
+        quote(field.column)
+        for field in (model._meta.get_field('user'), target, *stamps))
+    values = ', '.join(['%s', target_pk] + ['%s'] * len(stamps))
+    condition = f'{target_pk} IN ({", ".join(["%s"] * len(target_ids))})'
+    params = [
+        user.id,
+        *(field.get_db_prep_save(now, connection) for field in stamps),
+        *target_ids,
+    ]
+    if exclude_id is not None:
+        condition += f' AND {target_pk} <> %s'
+        params.append(exclude_id)
+    sql = (
+        f'{connection.ops.insert_statement(ignore_conflicts=True)} '
+        f'{quote(model._meta.db_table)} ({columns}) '
+        f'SELECT {values} FROM {quote(target_meta.db_table)} '
+        f'WHERE {condition} '
+        f'{connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}'
+        f' RETURNING {quote(target.column)}'
     )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def delete_returning(model, user, target_field, target_ids):
+    """Удаляет связи пользователя с объектами target_ids одним запросом
+    DELETE ... RETURNING и возвращает id действительно удалённых связей.
+    """
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    target = quote(model._meta.get_field(target_field).column)
+    sql = (
+        f'DELETE FROM {quote(model._meta.db_table)} '
+        f'WHERE {quote(model._meta.get_field("user").column)} = %s '
+        f'AND {target} IN ({", ".join(["%s"] * len(target_ids))}) '
+        f'RETURNING {target}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user.id, *target_ids])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def add(model, user, recipe_ids):
+    """Добавляет рецепты в избранное/список покупок; для списка покупок
+    в той же транзакции пересчитывается сумма ингредиентов."""
+    with transaction.atomic(using=router.db_for_write(model)):
+        added = insert_ignore_conflicts(model, user, 'recipe', recipe_ids)
+        if model is ShoppingCart:
+            shopping_list.add_recipes(user.id, added)
+    return added
+
+
+def remove(model, user, recipe_ids):
+    """Удаляет рецепты из избранного/списка покупок; для списка покупок
+    в той же транзакции пересчитывается сумма ингредиентов."""
+    with transaction.atomic(using=router.db_for_write(model)):
+        removed = delete_returning(model, user, 'recipe', recipe_ids)
+        if model is ShoppingCart:
+            shopping_list.remove_recipes(user.id, removed)
+    return removed
+
+
+def delete(request, recipe_id, model):
+    if remove(model, request.user, [recipe_id]):
+        update_memberships(request, model, removed=[recipe_id])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    get_object_or_404(Recipe, id=recipe_id)
+    return Response({'errors': DELETE_ERROR},
+                    status=status.HTTP_400_BAD_REQUEST)
 
 
 def post(request, recipe_id, model):
-    user = request.user
-    recipe = get_object_or_404(Recipe, id=recipe_id)
-    if model.objects.filter(user=user, recipe=recipe).exists():
-        return Response(
-            {
-                'errors': 'Ошибка добавления в избранное/список покупок '
-                '(Например, когда рецепт уже есть в '
-                'избранном/списке покупок)'
-            },
-            status=status.HTTP_400_BAD_REQUEST,
-        )
-    model.objects.get_or_create(user=user, recipe=recipe)
-    serializer = FavoriteSerializer(recipe, context={'request': request})
+    if not add(model, request.user, [recipe_id]):
+        get_object_or_404(Recipe, id=recipe_id)
+        return Response({'errors': POST_ERROR},
+                        status=status.HTTP_400_BAD_REQUEST)
+    update_memberships(request, model, added=[recipe_id])
+    recipe = get_object_or_404(
+        Recipe.objects.only('id', 'name', 'image', 'cooking_time'),
+        id=recipe_id)
+    serializer = fast(FavoriteSerializer)(recipe,
+                                          context={'request': request})
     return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+def post_many(request, recipe_ids, model):
+    added = add(model, request.user, recipe_ids)
+    if added:
+        update_memberships(request, model, added=added)
+    return Response({'added': len(added)}, status=status.HTTP_201_CREATED)
+
+
+def delete_many(request, recipe_ids, model):
+    deleted = remove(model, request.user, recipe_ids)
+    if deleted:
+        update_memberships(request, model, removed=deleted)
+    return Response({'deleted': len(deleted)}, status=status.HTTP_200_OK)
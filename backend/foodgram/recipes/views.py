@@ -1,35 +1,40 @@
-import io
-
-from django.db.models import F, Sum
-from django.http import FileResponse
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Max
+from django.http import FileResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
-from rest_framework import filters, viewsets
-from rest_framework.permissions import AllowAny
+from rest_framework import filters, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
+from foodgram.throttling import ExportThrottle
+
+from .collection import CollectionError, Importer, export_lines
+from .fast_serializers import fast
 from .filters import IngredientSearchFilter, RecipeFilter
-from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
-                     ShoppingCart, Tag)
+from .mixins import ConditionalGetMixin, ReplicaReadMixin, SparseFieldsMixin
+from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from .page_cache import cache_anonymous_page
 from .pagination import LimitPageNumberPagination
 from .permissions import OwnerOrReadOnly
-from .serializers import (IngredientSerializer, RecipeCreateSerializer,
-                          RecipeSerializer, TagSerializer)
-from .utils import delete, post
+from .serializers import (CollectionExportSerializer, IngredientSerializer,
+                          RecipeCardSerializer, RecipeCreateSerializer,
+                          RecipeIdsSerializer, RecipeSerializer,
+                          ShoppingListItemSerializer, TagSerializer)
+from .shopping_list import get_shopping_list, iter_shopping_list
+from .trending import get_ranked_ids
+from .utils import delete, delete_many, post, post_many
+
+RECIPE_COLUMNS = ('author', 'name', 'image', 'text', 'cooking_time')
 
-FONT_SIZE_HEADER = 24
-POSITION_X = 150
-POSITION_Y = 800
-FONT_SIZE = 16
-FROM_BOTTOM = 750
-MIN_BOTTOM = 50
-FROM_LEFT = 50
-LINE_SPACING = 20
+User = get_user_model()
 
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
@@ -37,7 +42,7 @@ class TagViewSet(viewsets.ModelViewSet):
     http_method_names = ['get']
 
 
-class IngredientsViewSet(viewsets.ModelViewSet):
+class IngredientsViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
@@ -47,7 +52,8 @@ class IngredientsViewSet(viewsets.ModelViewSet):
     http_method_names = ['get']
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, SparseFieldsMixin, ConditionalGetMixin,
+                    viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = (OwnerOrReadOnly,)
@@ -56,11 +62,91 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filterset_class = RecipeFilter
     filterset_fields = ('tags', 'author')
     ordering_fields = ('id',)
+    # retrieve и similar обращаются к базе по pk до get_object().
+    lookup_value_regex = r'\d+'
+
+    def get_read_serializer_class(self):
+        if (self.action in ('list', 'trending', 'similar')
+                and self.fields_param not in self.request.query_params):
+            return RecipeCardSerializer
+        return RecipeSerializer
 
     def get_serializer_class(self):
         if self.request.method in ['POST', 'PATCH']:
             return RecipeCreateSerializer
-        return RecipeSerializer
+        if self.request.method in permissions.SAFE_METHODS:
+            return fast(self.get_read_serializer_class())
+        return self.get_read_serializer_class()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset
+        columns = ['id']
+        columns.extend(name for name in RECIPE_COLUMNS if name in fields)
+        if 'author' in fields:
+            author = self.get_read_serializer_class()._declared_fields[
+                'author']
+            user_columns = {field.name for field in User._meta.concrete_fields}
+            columns.extend(f'author__{name}' for name in author.Meta.fields
+                           if name in user_columns)
+            queryset = queryset.select_related('author')
+        if 'tags' in fields:
+            queryset = queryset.prefetch_related('tags')
+        if 'ingredients' in fields:
+            queryset = queryset.prefetch_related(
+                'ingredient_to_recipe__ingredient')
+        return queryset.only(*columns)
+
+    @cache_anonymous_page
+    def list(self, request, *args, **kwargs):
+        # Как ListModelMixin.list, но фильтры применяются один раз и для
+        # ETag, и для страницы.
+        queryset = self.filter_queryset(self.get_queryset())
+        state = queryset.aggregate(last_modified=Max('updated'),
+                                   count=Count('id'))
+        response = self.not_modified(state['last_modified'], state['count'])
+        if response is not None:
+            return response
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Популярные рецепты: страница берётся из готового списка id,
+        из базы читаются только рецепты этой страницы."""
+        page = self.paginate_queryset(get_ranked_ids())
+        recipes = self.get_queryset().in_bulk(page)
+        serializer = self.get_serializer(
+            [recipes[id] for id in page if id in recipes], many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Похожие рецепты из таблицы, построенной командой
+        build_similar_recipes, без пагинации."""
+        recipes = list(
+            self.get_queryset().filter(similar_to__recipe_id=pk)
+            .order_by('similar_to__rank')
+        )
+        if not recipes:
+            get_object_or_404(Recipe, pk=pk)
+        serializer = self.get_serializer(recipes, many=True)
+        return Response(serializer.data)
+
+    @cache_anonymous_page
+    def retrieve(self, request, *args, **kwargs):
+        updated = (
+            Recipe.objects.filter(pk=kwargs[self.lookup_field])
+            .values_list('updated', flat=True).first()
+        )
+        if updated is not None:
+            response = self.not_modified(updated)
+            if response is not None:
+                return response
+        return super().retrieve(request, *args, **kwargs)
 
 
 class FavoriteView(APIView):
@@ -72,44 +158,79 @@ class FavoriteView(APIView):
 
 
 class ShoppingCardView(APIView):
+    throttle_classes = (*api_settings.DEFAULT_THROTTLE_CLASSES,
+                        ExportThrottle)
+
     def get(self, request):
-        user = request.user
-        shopping_list = (
-            IngredientInRecipe.objects.filter(recipe__shopping_cart__user=user)
-            .values(name=F('ingredient__name'),
-                    unit=F('ingredient__measurement_unit'))
-            .annotate(amount=Sum('amount'))
-        )
-        font = 'ComforterBrush-Regular'
-        pdfmetrics.registerFont(TTFont('ComforterBrush-Regular',
-                                       'ComforterBrush-Regular.ttf',
-                                       'UTF-8'))
-        buffer = io.BytesIO()
-        pdf_file = canvas.Canvas(buffer)
-        pdf_file.setFont(font, FONT_SIZE_HEADER)
-        pdf_file.drawString(POSITION_X, POSITION_Y, 'Список покупок.')
-        pdf_file.setFont(font, FONT_SIZE)
-        from_bottom = FROM_BOTTOM
-        for number, ingredient in enumerate(shopping_list, start=1):
-            pdf_file.drawString(
-                FROM_LEFT,
-                from_bottom,
-                f'{number}.  {ingredient["name"]} - {ingredient["amount"]} '
-                f'{ingredient["unit"]}',
-            )
-            from_bottom -= LINE_SPACING
-            if from_bottom <= MIN_BOTTOM:
-                from_bottom = MIN_BOTTOM + FROM_BOTTOM
-                pdf_file.showPage()
-                pdf_file.setFont(font, FONT_SIZE)
-        pdf_file.showPage()
-        pdf_file.save()
-        buffer.seek(0)
-        return FileResponse(buffer, as_attachment=True,
-                            filename='shopping_list.pdf')
+        # reportlab загружается при первой выгрузке, а не при старте
+        # воркера (см. команду importtime).
+        from .pdf import render_shopping_list
+
+        output, size = render_shopping_list(
+            iter_shopping_list(request.user.id))
+        response = FileResponse(output, as_attachment=True,
+                                filename='shopping_list.pdf')
+        response['Content-Length'] = size
+        return response
 
     def delete(self, request, recipe_id):
         return delete(request, recipe_id, ShoppingCart)
 
     def post(self, request, recipe_id):
         return post(request, recipe_id, ShoppingCart)
+
+
+class ShoppingListView(APIView):
+    """Список покупок в JSON: суммы ингредиентов читаются готовыми из
+    ShoppingListItem и сводятся по единицам измерения."""
+
+    def get(self, request):
+        return Response(ShoppingListItemSerializer(
+            get_shopping_list(request.user.id), many=True).data)
+
+
+class ShoppingCartBatchView(APIView):
+    def get_recipe_ids(self, request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['recipes']
+
+    def delete(self, request):
+        return delete_many(request, self.get_recipe_ids(request),
+                           ShoppingCart)
+
+    def post(self, request):
+        return post_many(request, self.get_recipe_ids(request),
+                         ShoppingCart)
+
+
+class CollectionExportView(APIView):
+    """Выгрузка коллекций пользователей (?user=id, по умолчанию - все)
+    потоком NDJSON."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        serializer = CollectionExportSerializer(
+            data={'user': request.query_params.getlist('user')})
+        serializer.is_valid(raise_exception=True)
+        user_ids = serializer.validated_data['user'] or None
+        response = StreamingHttpResponse(export_lines(user_ids),
+                                         content_type='application/x-ndjson')
+        response['Content-Disposition'] = (
+            'attachment; filename="collection.ndjson"')
+        return response
+
+
+class CollectionImportView(APIView):
+    """Загрузка NDJSON из тела запроса: строки читаются из потока, тело
+    целиком в память не загружается."""
+
+    permission_classes = (IsAdminUser,)
+
+    def post(self, request):
+        try:
+            stats = Importer().load(request.stream or ())
+        except CollectionError as error:
+            raise ValidationError({'errors': str(error)})
+        return Response(stats, status=status.HTTP_201_CREATED)
@@ -0,0 +1,120 @@
+"""Прогрев после деплоя.
+
+warm_process - состояние процесса без обращений к базе: шрифт PDF и
+ширины его символов, разбор URL-конфигурации. При WARM_ON_STARTUP его
+вызывает RecipesConfig.ready; gunicorn с preload_app загружает приложение
+в мастере до fork, так что воркеры получают его готовым. К базе в ready
+обращаться нельзя: соединение, открытое до fork, досталось бы всем
+воркерам сразу. Соединения открывает каждый воркер сам в хуке post_fork
+(warm_connections, см. gunicorn.conf.py).
+
+warm_shared - общий кэш Django (ответы для анонимов, популярные рецепты,
+профили и число пользователей). Запускается командой warm_caches из
+отдельного процесса, поэтому имеет смысл только для кэша, общего с
+воркерами: с LocMemCache прогретое осталось бы в процессе команды.
+Запросы идут от имени WARM_URL: от схемы и хоста зависят ключи кэша
+ответов и ссылки в них, поэтому это должен быть публичный адрес сайта,
+заданный явно.
+"""
+import json
+import string
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connections
+from django.test import Client
+from django.urls import get_resolver
+
+from .pdf import FONT, FONT_SIZE, FONT_SIZE_HEADER, get_widths
+from .trending import get_ranked_ids
+
+CHARS = (string.printable.strip() + ' '
+         + ''.join(map(chr, range(ord('А'), ord('я') + 1))) + 'Ёё')
+REFERENCE_PATHS = ('/api/tags/', '/api/ingredients/')
+FEED_PATH = '/api/recipes/'
+USERS_PATH = '/api/users/'
+# Кэши, которые живут в памяти одного процесса.
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+class WarmupError(Exception):
+    pass
+
+
+def timed(steps, title, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    steps.append((title, time.perf_counter() - started))
+    return result
+
+
+def warm_fonts():
+    for size in (FONT_SIZE, FONT_SIZE_HEADER):
+        widths = get_widths(FONT, size)
+        for char in CHARS:
+            widths[char]
+
+
+def warm_urls():
+    # Импорт urls.py со всеми вьюхами и словари для reverse().
+    get_resolver().reverse_dict
+
+
+def warm_process():
+    """Прогревает процесс; возвращает [(шаг, секунды)]."""
+    steps = []
+    timed(steps, 'fonts', warm_fonts)
+    timed(steps, 'urls', warm_urls)
+    return steps
+
+
+def warm_connections():
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+def check_shared():
+    backend = settings.CACHES['default']['BACKEND']
+    if backend in PER_PROCESS_CACHES:
+        raise WarmupError(f'Кэш {backend} не общий для воркеров: задайте '
+                          f'CACHE_BACKEND.')
+    if not settings.WARM_URL:
+        raise WarmupError('Не задан WARM_URL - публичный адрес сайта.')
+
+
+def get_client():
+    url = urlsplit(settings.WARM_URL)
+    return Client(HTTP_HOST=url.netloc, **{'wsgi.url_scheme': url.scheme})
+
+
+def fetch(client, path, params=None):
+    response = client.get(path, params)
+    if response.status_code != 200:
+        raise WarmupError(f'{path} {params or ""}: статус '
+                          f'{response.status_code}.')
+    # Ответ из кэша страниц - готовый HttpResponse без .data.
+    return json.loads(response.content)
+
+
+def get_pages(client, path, pages):
+    for page in range(1, pages + 1):
+        if not fetch(client, path, {'page': page}).get('next'):
+            break
+
+
+def warm_shared(pages):
+    """Прогревает общий кэш: справочники, первые pages страниц ленты
+    рецептов и пользователей; возвращает [(шаг, секунды)]."""
+    check_shared()
+    client = get_client()
+    steps = []
+    for path in REFERENCE_PATHS:
+        timed(steps, path, fetch, client, path)
+    timed(steps, FEED_PATH, get_pages, client, FEED_PATH, pages)
+    timed(steps, USERS_PATH, get_pages, client, USERS_PATH, pages)
+    timed(steps, 'trending', get_ranked_ids)
+    return steps
@@ -1,11 +1,51 @@
 from django.contrib import admin
+from django.contrib.auth.models import Permission
 
+from .follows import reconcile
 from .models import Follow, User
 
 
 class UserAdmin(admin.ModelAdmin):
-    list_filter = ('username', 'email')
+    list_display = ('id', 'username', 'email', 'first_name', 'last_name',
+                    'followers_count', 'following_count')
+    list_filter = ('is_staff', 'is_active')
+    search_fields = ('username', 'email', 'first_name', 'last_name')
+    show_full_result_count = False
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        if db_field.name == 'user_permissions':
+            # Название права включает тип содержимого: без select_related
+            # это запрос на каждое право в списке.
+            kwargs['queryset'] = Permission.objects.select_related(
+                'content_type')
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
+
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ('user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+    autocomplete_fields = ('user', 'author')
+    show_full_result_count = False
+
+    # Подписки из админки меняются в обход users.follows: счётчики
+    # затронутых пользователей пересчитываются.
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        reconcile({obj.user_id, obj.author_id, form.initial.get('user'),
+                   form.initial.get('author')} - {None})
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        reconcile([obj.user_id, obj.author_id])
+
+    def delete_queryset(self, request, queryset):
+        user_ids = set()
+        for pair in queryset.values_list('user_id', 'author_id'):
+            user_ids.update(pair)
+        super().delete_queryset(request, queryset)
+        reconcile(user_ids)
 
 
 admin.site.register(User, UserAdmin)
-admin.site.register(Follow)
+admin.site.register(Follow, FollowAdmin)
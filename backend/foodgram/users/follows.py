@@ -0,0 +1,98 @@
+"""Подписки и счётчики подписчиков/подписок пользователя.
+
+User.followers_count и User.following_count меняются в той же транзакции,
+что и строка Follow, одним UPDATE обеих строк пользователей: блокировки
+берутся в одном порядке, и встречные подписки двух пользователей не
+взаимоблокируются. Сигналов у Follow нет (см. recipes.signals), поэтому
+всё, что создаёт и удаляет подписки, идёт через follow()/unfollow() или
+пересчитывает счётчики reconcile().
+"""
+from django.db import router, transaction
+from django.db.models import (Case, Count, F, IntegerField, OuterRef, Q,
+                              Subquery, Value, When)
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.utils import delete_returning, insert_ignore_conflicts
+
+from .models import Follow, User
+from .profiles import invalidate_profiles
+
+
+def counter(field, user_id, delta):
+    return Case(
+        When(id=user_id, then=Greatest(F(field) + delta, Value(0))),
+        default=F(field),
+    )
+
+
+def update_counts(user_id, author_id, delta):
+    User.objects.filter(id__in=(user_id, author_id)).update(
+        following_count=counter('following_count', user_id, delta),
+        followers_count=counter('followers_count', author_id, delta),
+    )
+    transaction.on_commit(
+        lambda: invalidate_profiles([user_id, author_id]),
+        using=router.db_for_write(User))
+
+
+def follow(user, author_id):
+    """Подписывает user на автора; False, если подписка уже была, автора
+    нет или это сам пользователь."""
+    with transaction.atomic(using=router.db_for_write(Follow)):
+        if not insert_ignore_conflicts(Follow, user, 'author', [author_id],
+                                       exclude_id=user.id):
+            return False
+        update_counts(user.id, author_id, 1)
+    return True
+
+
+def unfollow(user, author_id):
+    """Отписывает user от автора; False, если подписки не было."""
+    with transaction.atomic(using=router.db_for_write(Follow)):
+        if not delete_returning(Follow, user, 'author', [author_id]):
+            return False
+        update_counts(user.id, author_id, -1)
+    return True
+
+
+def actual_count(field):
+    return Coalesce(Subquery(
+        Follow.objects.filter(**{field: OuterRef('pk')}).order_by()
+        .values(field).annotate(count=Count('*')).values('count'),
+        output_field=IntegerField(),
+    ), Value(0))
+
+
+def mismatched_users(user_ids=None):
+    """Пользователи (из user_ids или все), чьи счётчики не совпадают с
+    таблицей подписок."""
+    users = User.objects.all()
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+    return users.annotate(
+        actual_followers=actual_count('author'),
+        actual_following=actual_count('user'),
+    ).filter(
+        ~Q(followers_count=F('actual_followers'))
+        | ~Q(following_count=F('actual_following'))
+    )
+
+
+def reconcile(user_ids=None, batch_size=5000):
+    """Пересчитывает счётчики пользователей user_ids (всех, если None) по
+    таблице подписок и возвращает id пользователей с расхождениями."""
+    users = mismatched_users(user_ids)
+    fixed = []
+    last_id = 0
+    while True:
+        ids = list(users.filter(id__gt=last_id).order_by('id')
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return fixed
+        User.objects.filter(id__in=ids).update(
+            followers_count=actual_count('author'),
+            following_count=actual_count('user'),
+        )
+        invalidate_profiles(ids)
+        fixed.extend(ids)
+        last_id = ids[-1]
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users.follows import mismatched_users, reconcile
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает счётчики подписчиков и подписок пользователей с '
+            'таблицей подписок; с --fix пересчитывает расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Пересчитать счётчики с расхождениями.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        user_ids = list(mismatched_users().order_by('id')
+                        .values_list('id', flat=True))
+        if not user_ids:
+            self.stdout.write(self.style.SUCCESS('Счётчики подписок '
+                                                 'совпадают.'))
+            return
+        self.stdout.write(
+            f'Расхождения у {len(user_ids)} пользователей: '
+            f'{", ".join(map(str, user_ids[:20]))}')
+        if not options['fix']:
+            raise CommandError('Счётчики подписок не совпадают, '
+                               'запустите с --fix.')
+        fixed = reconcile(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики пересчитаны у {len(fixed)} пользователей.'))
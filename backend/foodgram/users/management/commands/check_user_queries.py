@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.management.commands.benchmark import CaptureAllQueries
+
+User = get_user_model()
+
+SMALL_PAGE = 6
+LARGE_PAGE = 60
+
+
+class Command(BaseCommand):
+    help = ('Проверяет, что число запросов к БД у списка, профиля и '
+            'подписчиков пользователей не зависит от размера страницы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-queries', type=int, default=7,
+                            help='Допустимое число запросов на страницу.')
+
+    def get_params(self, params, limit, user_count):
+        params = {**params, 'limit': limit}
+        if 'page' in params:
+            # Вторая страница (не нулевой OFFSET), если пользователей
+            # на неё хватает.
+            params['page'] = 2 if user_count > limit else 1
+        return params
+
+    def count(self, client, url, params):
+        with CaptureAllQueries() as queries:
+            status = client.get(url, params).status_code
+        if status != 200:
+            raise CommandError(f'{url} {params}: статус {status}.')
+        return len(queries)
+
+    def handle(self, *args, **options):
+        user = User.objects.order_by('id').first()
+        if user is None:
+            raise CommandError('Нет пользователей: заполните базу командой '
+                               'generate_data.')
+        user_count = User.objects.count()
+        token, _ = Token.objects.get_or_create(user=user)
+        authorized = APIClient()
+        authorized.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        failed = []
+        for name, client in (('anonymous', APIClient()),
+                             ('authorized', authorized)):
+            for url, params in (
+                ('/api/users/', {'page': 2}),
+                ('/api/users/', {'cursor': user.id}),
+                (f'/api/users/{user.id}/followers/', {}),
+            ):
+                counts = [
+                    self.count(client, url,
+                               self.get_params(params, limit, user_count))
+                    for limit in (SMALL_PAGE, LARGE_PAGE)
+                ]
+                self.stdout.write(f'{name:10} {url} {params} '
+                                  f'queries={counts}')
+                # С кэшем профилей первая страница ещё и заполняет кэш.
+                if (counts[1] > counts[0]
+                        or counts[1] > options['max_queries']):
+                    failed.append(f'{name} {url} {params}')
+            queries = self.count(client, f'/api/users/{user.id}/', {})
+            self.stdout.write(f'{name:10} /api/users/{user.id}/ '
+                              f'queries={queries}')
+            if queries > options['max_queries']:
+                failed.append(f'{name} /api/users/{user.id}/')
+        if failed:
+            raise CommandError('Слишком много запросов: ' + ', '.join(failed))
+        self.stdout.write(self.style.SUCCESS(
+            f'Не больше {options["max_queries"]} запросов, число не зависит '
+            f'от размера страницы.'))
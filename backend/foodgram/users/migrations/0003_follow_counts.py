@@ -0,0 +1,47 @@
+# Generated by Django 3.2 on 2026-10-19 10:37
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_follow_counts(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Follow = apps.get_model('users', 'Follow')
+    db_alias = schema_editor.connection.alias
+
+    def count(field):
+        return Coalesce(Subquery(
+            Follow.objects.using(db_alias).filter(**{field: OuterRef('pk')})
+            .order_by().values(field).annotate(count=Count('*'))
+            .values('count'),
+            output_field=IntegerField(),
+        ), Value(0))
+
+    User.objects.using(db_alias).update(
+        followers_count=count('author'), following_count=count('user'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_follow_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписок'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'user'], name='author_user'),
+        ),
+        migrations.RunPython(fill_follow_counts, migrations.RunPython.noop),
+    ]
@@ -28,6 +28,14 @@ class User(AbstractUser):
         max_length=150,
         blank=False,
         verbose_name='Пароль')
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчиков')
+    following_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписок')
     REQUIRED_FIELDS = ['first_name', 'last_name', 'email']
 
     class Meta:
@@ -57,3 +65,6 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='user_author')
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'], name='author_user'),
+        ]
@@ -1,6 +1,100 @@
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .profiles import get_user_count
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+
+
+class UserPaginator(Paginator):
+    """Число пользователей берётся из кэша, а не COUNT(*) по таблице."""
+
+    @cached_property
+    def count(self):
+        return get_user_count()
+
+
+class CursorMixin:
+    """Страница по курсору ?cursor=id: объекты с cursor_field больше
+    курсора, без OFFSET и подсчёта. Ожидает queryset значений
+    cursor_field."""
+
+    cursor_query_param = 'cursor'
+    cursor_field = 'id'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def get_cursor(self, request):
+        value = request.query_params.get(self.cursor_query_param)
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_by_cursor(self, queryset, request, cursor):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if cursor is not None:
+            queryset = queryset.filter(**{f'{self.cursor_field}__gt': cursor})
+        ids = list(queryset.order_by(self.cursor_field)[:page_size + 1])
+        self.next_cursor = ids[page_size - 1] if len(ids) > page_size else None
+        return ids[:page_size]
+
+    def get_next_cursor_link(self):
+        if self.next_cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(),
+                                 self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.next_cursor)
+
+
+class UserPagination(CursorMixin, LimitPageNumberPagination):
+    """Страницы ?page=N для совместимости с фронтендом и курсор ?cursor=id
+    для последовательного обхода.
+
+    Ожидает queryset id пользователей.
+    """
+
+    django_paginator_class = UserPaginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor = self.get_cursor(request)
+        if self.cursor is None:
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginate_by_cursor(queryset, request, self.cursor)
+
+    def get_paginated_response(self, data):
+        if self.cursor is None:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_cursor_link(),
+            'results': data,
+        })
+
+
+class FollowersPagination(CursorMixin, LimitPageNumberPagination):
+    """Подписчики автора только по курсору (id подписчика), по индексу
+    (author, user). count - сохранённый счётчик, его задаёт view."""
+
+    cursor_field = 'user_id'
+    count = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_by_cursor(queryset, request,
+                                       self.get_cursor(request))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_cursor_link(),
+            'results': data,
+        })
@@ -0,0 +1,86 @@
+"""Кэш публичных профилей пользователей для /api/users/.
+
+Профиль - поля UserProfileSerializer без is_subscribed: они одинаковы для
+всех читателей и хранятся в кэше под ключом на пользователя. is_subscribed
+зависит от читателя и добавляется из множества подписок (memberships).
+Профиль сбрасывается сигналами при сохранении и удалении пользователя и
+при подписке и отписке (счётчики, users.follows), число пользователей -
+при создании и удалении.
+
+При ``PROFILE_CACHE_TIMEOUT = 0`` профили читаются из базы одним запросом
+на страницу.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from foodgram.db_router import PRIMARY
+from recipes.memberships import get_memberships
+
+from .models import User
+from .serializers import UserProfileSerializer
+
+PROFILE_KEY = 'profile:{user_id}'
+COUNT_KEY = 'users:count'
+USER_FIELDS = UserProfileSerializer.Meta.fields
+PROFILE_FIELDS = tuple(name for name in USER_FIELDS
+                       if name != 'is_subscribed')
+
+
+def load_profiles(user_ids):
+    # Читаем с основной базы: устаревший профиль с реплики остался бы в
+    # кэше до истечения таймаута. is_subscribed - заглушка на своём месте,
+    # чтобы порядок ключей совпадал с сериализатором.
+    return {
+        row['id']: {name: row.get(name, False) for name in USER_FIELDS}
+        for row in User.objects.using(PRIMARY).filter(
+            id__in=user_ids).values(*PROFILE_FIELDS)
+    }
+
+
+def get_profiles(user_ids):
+    """Профили пользователей user_ids: словарь id -> профиль."""
+    timeout = settings.PROFILE_CACHE_TIMEOUT
+    if not timeout:
+        return load_profiles(user_ids)
+    keys = {user_id: PROFILE_KEY.format(user_id=user_id)
+            for user_id in user_ids}
+    cached = cache.get_many(keys.values())
+    profiles = {user_id: cached[key] for user_id, key in keys.items()
+                if key in cached}
+    missing = [user_id for user_id in user_ids if user_id not in profiles]
+    if missing:
+        loaded = load_profiles(missing)
+        cache.set_many({keys[user_id]: profile
+                        for user_id, profile in loaded.items()}, timeout)
+        profiles.update(loaded)
+    return profiles
+
+
+def get_user_data(request, user_ids):
+    """Представления UserProfileSerializer для user_ids в том же порядке."""
+    following = get_memberships(request).following
+    profiles = get_profiles(user_ids)
+    return [
+        {**profiles[user_id], 'is_subscribed': user_id in following}
+        for user_id in user_ids if user_id in profiles
+    ]
+
+
+def get_user_count():
+    timeout = settings.PROFILE_CACHE_TIMEOUT
+    if not timeout:
+        return User.objects.count()
+    count = cache.get(COUNT_KEY)
+    if count is None:
+        count = User.objects.using(PRIMARY).count()
+        cache.set(COUNT_KEY, count, timeout)
+    return count
+
+
+def invalidate_profiles(user_ids, count=False):
+    if not settings.PROFILE_CACHE_TIMEOUT:
+        return
+    keys = [PROFILE_KEY.format(user_id=user_id) for user_id in user_ids]
+    if count:
+        keys.append(COUNT_KEY)
+    cache.delete_many(keys)
@@ -3,10 +3,9 @@ from djoser.compat import get_user_email, get_user_email_field_name
 from djoser.conf import settings
 from rest_framework import serializers
 
+from recipes.memberships import get_memberships
 from recipes.models import Recipe
 
-from .models import Follow
-
 User = get_user_model()
 
 VISIBLE_QUANTITY = 3
@@ -21,12 +20,7 @@ class UserSerializer(serializers.ModelSerializer):
                   'is_subscribed')
 
     def get_is_subscribed(self, author):
-        return (
-            self.context['request'].user.is_authenticated
-            and Follow.objects.filter(
-                user=self.context['request'].user, author=author
-            ).exists()
-        )
+        return author.id in get_memberships(self.context['request']).following
 
     def update(self, instance, validated_data):
         email_field = get_user_email_field_name(User)
@@ -38,6 +32,22 @@ class UserSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
+class UserProfileSerializer(UserSerializer):
+    """Пользователь со счётчиками подписчиков и подписок - для
+    /api/users/; вложенные авторы рецептов выводятся без них."""
+
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ('followers_count',
+                                               'following_count')
+        read_only_fields = ('followers_count', 'following_count')
+
+
+class AuthorCardSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ('id', 'username', 'first_name', 'last_name')
+
+
 class TokenCreateSerializer(serializers.Serializer):
     password = serializers.CharField(required=False,
                                      style={'input_type': 'password'})
@@ -101,9 +111,11 @@ class SubscriptionsSerializer(serializers.ModelSerializer):
         return FollowingRecipeSerializer(recipes, many=True).data
 
     def get_is_subscribed(self, author):
-        return Follow.objects.filter(
-            author=author, user=self.context['request'].user
-        ).exists()
+        return author.id in get_memberships(self.context['request']).following
 
     def get_recipes_count(self, author):
+        # Список подписок аннотирует число рецептов и подгружает только
+        # последние VISIBLE_QUANTITY из них.
+        if hasattr(author, 'recipes_count'):
+            return author.recipes_count
         return author.recipes.count()
@@ -0,0 +1,38 @@
+"""Сброс кэша профилей при изменении и удалении пользователей; удаление
+пользователя уменьшает счётчики тех, с кем он был связан подписками."""
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Follow, User
+from .profiles import PROFILE_FIELDS, invalidate_profiles
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    # Вход в систему сохраняет только last_login.
+    if (update_fields is not None
+            and not set(PROFILE_FIELDS) & set(update_fields)):
+        return
+    invalidate_profiles([instance.pk], count=created)
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    # Подписки удалятся каскадом без сигналов: счётчики второй стороны
+    # уменьшаются здесь, в той же транзакции.
+    authors = list(Follow.objects.filter(user=instance)
+                   .values_list('author_id', flat=True))
+    followers = list(Follow.objects.filter(author=instance)
+                     .values_list('user_id', flat=True))
+    User.objects.filter(id__in=authors).update(
+        followers_count=Greatest(F('followers_count') - 1, Value(0)))
+    User.objects.filter(id__in=followers).update(
+        following_count=Greatest(F('following_count') - 1, Value(0)))
+    invalidate_profiles(authors + followers)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_profiles([instance.pk], count=True)
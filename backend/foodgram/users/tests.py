@@ -0,0 +1,146 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from .follows import follow
+
+User = get_user_model()
+
+
+def create_users(start, count):
+    """count пользователей с номерами от start, каждый подписан на
+    предыдущего."""
+    users = [
+        User.objects.create_user(
+            username=f'user{number}', email=f'user{number}@example.com',
+            first_name='Иван', last_name='Петров', password=None)
+        for number in range(start, start + count)
+    ]
+    for user, author in zip(users[1:], users):
+        follow(user, author.id)
+    return users
+
+
+class AdminQueryTests(TestCase):
+    """Число запросов страниц админки не зависит от числа строк."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', first_name='Админ',
+            last_name='Админов', password='password-123')
+        create_users(1, 2)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def count_queries(self, url):
+        # Первый запрос заполняет кэш ContentType.
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries)
+
+    def test_changelists(self):
+        urls = [reverse('admin:users_user_changelist'),
+                reverse('admin:users_follow_changelist')]
+        counts = [self.count_queries(url) for url in urls]
+        create_users(10, 30)
+        for url, count in zip(urls, counts):
+            with self.subTest(url=url):
+                with self.assertNumQueries(count):
+                    self.client.get(url)
+
+    def test_change_forms(self):
+        user = User.objects.get(username='user2')
+        counts = [
+            self.count_queries(reverse('admin:users_user_change',
+                                       args=(user.pk,))),
+            self.count_queries(reverse('admin:users_follow_change',
+                                       args=(user.follower.get().pk,))),
+        ]
+        user = create_users(10, 30)[-1]
+        urls = [reverse('admin:users_user_change', args=(user.pk,)),
+                reverse('admin:users_follow_change',
+                        args=(user.follower.get().pk,))]
+        for url, count in zip(urls, counts):
+            with self.subTest(url=url):
+                with self.assertNumQueries(count):
+                    self.client.get(url)
+
+
+class UserQueryTests(APITestCase):
+    """Число запросов списка и профиля пользователей не зависит от
+    размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_users(1, 30)
+        for user in cls.users[2:]:
+            follow(user, cls.users[0].id)
+        cls.token = Token.objects.create(user=cls.users[1])
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries)
+
+    def assert_page_size_independent(self, url, params):
+        expected = self.count_queries(url, {**params, 'limit': 2})
+        with self.assertNumQueries(expected):
+            response = self.client.get(url, {**params, 'limit': 12})
+        self.assertEqual(len(response.json()['results']), 12)
+
+    def check_endpoints(self):
+        user = self.users[0]
+        for url, params in (
+            ('/api/users/', {'page': 2}),
+            ('/api/users/', {'cursor': user.id}),
+            (f'/api/users/{user.id}/followers/', {}),
+        ):
+            with self.subTest(url=url, params=params):
+                self.assert_page_size_independent(url, params)
+        with self.subTest(url='profile'):
+            expected = self.count_queries(f'/api/users/{user.id}/')
+            with self.assertNumQueries(expected):
+                self.client.get(f'/api/users/{self.users[-1].id}/')
+
+    def test_anonymous(self):
+        self.check_endpoints()
+
+    def test_authorized(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.check_endpoints()
+
+    def test_is_subscribed(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        for author, expected in ((self.users[0], True),
+                                 (self.users[2], False)):
+            with self.subTest(author=author.username):
+                response = self.client.get(f'/api/users/{author.id}/')
+                self.assertIs(response.json()['is_subscribed'], expected)
+
+    @override_settings(PROFILE_CACHE_TIMEOUT=60)
+    def test_profile_cache(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        user = self.users[0]
+        self.client.get('/api/users/', {'page': 2, 'limit': 12})
+        self.client.get(f'/api/users/{user.id}/')
+        # Из базы читаются только id страницы, профили и число
+        # пользователей - из кэша.
+        with self.assertNumQueries(1):
+            self.client.get('/api/users/', {'page': 2, 'limit': 12})
+        with self.assertNumQueries(0):
+            self.client.get(f'/api/users/{user.id}/')
+        user.first_name = 'Пётр'
+        user.save()
+        response = self.client.get(f'/api/users/{user.id}/')
+        self.assertEqual(response.json()['first_name'], 'Пётр')
@@ -1,15 +1,20 @@
 from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
-from .views import ListSubscriptions, Subscribe
+from .views import ListSubscriptions, Subscribe, TokenCreateView, UserViewSet
 
 router = DefaultRouter()
 router.register(r'', ListSubscriptions, basename='subscriptions')
 
+users_router = DefaultRouter()
+users_router.register('users', UserViewSet)
+
 urlpatterns = [
     path('users/subscriptions/', include(router.urls)),
 
     path('users/<int:id>/subscribe/', Subscribe.as_view(), name='subscribe'),
-    path(r'', include('djoser.urls')),
+    path(r'', include(users_router.urls)),
+    re_path(r'^auth/token/login/?$', TokenCreateView.as_view(),
+            name='login'),
     re_path(r'^auth/', include('djoser.urls.authtoken')),
 ]
@@ -1,45 +1,62 @@
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from rest_framework import status, viewsets
+from djoser import views as djoser_views
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from foodgram.throttling import LoginThrottle
+from recipes.fast_serializers import fast
+from recipes.memberships import update_memberships
+from recipes.mixins import ReplicaReadMixin
+from recipes.models import Recipe
+
+from .follows import follow, unfollow
 from .models import Follow, User
-from .pagination import LimitPageNumberPagination
-from .serializers import SubscriptionsSerializer
+from .pagination import (FollowersPagination, LimitPageNumberPagination,
+                         UserPagination)
+from .profiles import get_user_data
+from .serializers import VISIBLE_QUANTITY, SubscriptionsSerializer
 
 
-class ListSubscriptions(viewsets.ModelViewSet):
+class ListSubscriptions(ReplicaReadMixin, viewsets.ModelViewSet):
     serializer_class = SubscriptionsSerializer
     pagination_class = LimitPageNumberPagination
 
     def get_queryset(self):
         user = self.request.user
-        return User.objects.filter(following__user=user)
+        latest_recipes = Recipe.objects.filter(id__in=Subquery(
+            Recipe.objects.filter(author_id=OuterRef('author_id'))
+            .order_by('-id').values('id')[:VISIBLE_QUANTITY]
+        ))
+        return (
+            User.objects.filter(following__user=user)
+            .annotate(recipes_count=Count('recipes'))
+            .prefetch_related(Prefetch('recipes', queryset=latest_recipes))
+        )
+
+    def get_serializer_class(self):
+        if self.request.method in permissions.SAFE_METHODS:
+            return fast(SubscriptionsSerializer)
+        return SubscriptionsSerializer
 
 
 class Subscribe(APIView):
     def delete(self, request, id):
-        user = request.user
-        author = get_object_or_404(User, id=id)
-        if not (
-            user == author or Follow.objects.filter(user=user,
-                                                    author=author).exists()
-        ):
-            return Response(
-                {'errors': 'Ошибка подписки (Например, если не был подписан'},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        subscription = get_object_or_404(Follow, user=user, author=author)
-        subscription.delete()
+        if unfollow(request.user, id):
+            update_memberships(request, Follow, removed=[id])
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(User, id=id)
         return Response(
-            {'errors': 'Успешная отписка'}, status=status.HTTP_204_NO_CONTENT
+            {'errors': 'Ошибка подписки (Например, если не был подписан'},
+            status=status.HTTP_400_BAD_REQUEST,
         )
 
     def post(self, request, id):
-        user = request.user
-        author = get_object_or_404(User, id=id)
-        if user == author or Follow.objects.filter(user=user,
-                                                   author=author).exists():
+        if not follow(request.user, id):
+            get_object_or_404(User, id=id)
             return Response(
                 {
                     'errors': 'Ошибка подписки (Например, если уже '
@@ -47,7 +64,56 @@ class Subscribe(APIView):
                 },
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        Follow.objects.get_or_create(user=user, author=author)
-        serializer = SubscriptionsSerializer(author,
-                                             context={'request': request})
+        update_memberships(request, Follow, added=[id])
+        author = get_object_or_404(User, id=id)
+        serializer = fast(SubscriptionsSerializer)(
+            author, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class UserViewSet(ReplicaReadMixin, djoser_views.UserViewSet):
+    """Пользователи djoser; список и профиль собираются из кэша профилей
+    (users.profiles), из базы на странице читаются только id."""
+
+    pagination_class = UserPagination
+
+    def list(self, request, *args, **kwargs):
+        ids = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset())
+            .order_by('id').values_list('id', flat=True))
+        return self.get_paginated_response(get_user_data(request, ids))
+
+    def retrieve(self, request, *args, **kwargs):
+        if self.action == 'me':
+            return super().retrieve(request, *args, **kwargs)
+        try:
+            user_id = int(kwargs[self.lookup_field])
+        except ValueError:
+            raise Http404
+        data = get_user_data(request, [user_id])
+        if not data:
+            raise Http404
+        return Response(data[0])
+
+    @action(detail=True, methods=['get'])
+    def followers(self, request, *args, **kwargs):
+        """Подписчики пользователя по возрастанию id, страницы по
+        курсору."""
+        try:
+            author_id = int(kwargs[self.lookup_field])
+        except ValueError:
+            raise Http404
+        count = (User.objects.filter(id=author_id)
+                 .values_list('followers_count', flat=True).first())
+        if count is None:
+            raise Http404
+        paginator = FollowersPagination()
+        paginator.count = count
+        ids = paginator.paginate_queryset(
+            Follow.objects.filter(author_id=author_id)
+            .values_list('user_id', flat=True), request, view=self)
+        return paginator.get_paginated_response(get_user_data(request, ids))
+
+
+class TokenCreateView(djoser_views.TokenCreateView):
+    throttle_classes = (LoginThrottle,)